@@ -0,0 +1,78 @@
+import pandas as pd
+
+from sales_cube import MAX_MEASURES, ROW_COUNT, is_cube
+from parallel_engine import partitioned_aggregate
+from compact_storage import is_month_code, measure_frame, month_categorical
+
+# Helper counts carried with every aggregate so per-row means stay exact
+COUNT_COLUMNS = [ROW_COUNT, "margen_filas"]
+
+def build_plan(requests):
+    """
+    Merge the aggregations a page needs into a single plan
+    requests: {name: {'by': [group keys], 'measures': [summed columns],
+                      'max_measures': [MAX_MEASURES columns, optional]}}
+    """
+    keys, measures, max_measures = [], [], []
+    for spec in requests.values():
+        keys += [key for key in spec['by'] if key not in keys]
+        measures += [col for col in spec['measures'] if col not in measures]
+        max_measures += [col for col in spec.get('max_measures', []) if col not in max_measures]
+    return {'keys': keys, 'measures': measures, 'max_measures': max_measures, 'requests': requests}
+
+def _rollup(frame, by, measures, max_measures):
+    """Roll a base aggregate up to fewer keys (sums, plus max for max measures)"""
+    agg = {col: "sum" for col in measures + COUNT_COLUMNS}
+    agg.update({col: "max" for col in max_measures})
+    if not by:
+        return {col: frame[col].agg(how) for col, how in agg.items()}
+    return frame.groupby(by, observed=True, dropna=False, sort=False).agg(agg).reset_index()
+
+def _base_aggregate(plan, source):
+    """Aggregate the source once on the union of the plan's keys"""
+    keys, measures, max_measures = plan['keys'], plan['measures'], plan['max_measures']
+    
+    if is_cube(source):
+        base = _rollup(source, keys, measures, max_measures)
+        return pd.DataFrame([base]) if not keys else base
+    
+    named = {col: (col, "sum") for col in measures}
+    named.update({col: (MAX_MEASURES[col], "max") for col in max_measures})
+    named["margen_filas"] = ("margen_%", "count")
+    # Derived metrics of compact frames are computed for this scan only
+    values = measure_frame(source, list(dict.fromkeys(source_col for source_col, _ in named.values())))
+    if not keys:
+        base = {col: values[source_col].agg(how) for col, (source_col, how) in named.items()}
+        base[ROW_COUNT] = len(source)
+        return pd.DataFrame([base])
+    grouped = pd.concat([source[keys], values], axis=1).groupby(keys, observed=True, dropna=False, sort=False)
+    base = grouped.agg(**named)
+    base[ROW_COUNT] = grouped.size()
+    base = base.reset_index()
+    if "mes" in keys and is_month_code(base["mes"]):
+        base["mes"] = month_categorical(base["mes"].to_numpy())
+    return base
+
+def execute_plan(plan, source, workers=1):
+    """
+    Compute every requested aggregation with one scan of the source
+    The source may be filtered rows or a cube slice; each request is rolled
+    up from the (small) base aggregate. 'totals' holds the grand totals.
+    With workers > 1 the base aggregate is computed per month partition.
+    """
+    base = partitioned_aggregate(source, plan['keys'], lambda part: _base_aggregate(plan, part), workers)
+    
+    results = {'totals': _rollup(base, [], plan['measures'], plan['max_measures'])}
+    for name, spec in plan['requests'].items():
+        rolled = _rollup(base, spec['by'], spec['measures'], spec.get('max_measures', []))
+        if spec['by']:
+            rolled = rolled.sort_values(spec['by'], ignore_index=True)
+        results[name] = rolled
+    return results
+
+def per_row_mean(aggregate, column):
+    """Per-transaction mean of a summed measure from an aggregate row or frame"""
+    count = aggregate["margen_filas" if column == "margen_%" else ROW_COUNT]
+    if isinstance(aggregate, dict):
+        return aggregate[column] / count if count > 0 else float("nan")
+    return (aggregate[column] / count).where(count > 0)
@@ -1,7 +1,8 @@
 import streamlit as st
-import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
+from data_loader import load_sales_data
+from charts import TABLE_SORT_COLUMNS, TABLE_PAGE_SIZES, paginate_transactions
 
 # ─── CONFIG ───────────────────────────────────────────────
 st.set_page_config(
@@ -12,15 +13,10 @@ st.set_page_config(
 )
 
 # ─── CARGAR DATOS ─────────────────────────────────────────
-@st.cache_data
 def cargar_datos():
-    df = pd.read_csv("ventas_data.csv")
-    # Convertir fechas ANTES de cualquier agrupación
-    df["fecha"] = pd.to_datetime(df["fecha"])
-    df["mes"] = df["fecha"].dt.to_period("M").astype(str)
-    df["ganancia"] = df["ventas_total"] - df["costo_total"]
-    df["margen_%"] = (df["ganancia"] / df["ventas_total"] * 100).round(1)
-    return df
+    # DataFrame compartido de solo lectura (una copia por proceso, no por sesión);
+    # siempre en formato estándar: este tablero agrupa por mes y ganancia directamente
+    return load_sales_data(compact=False)
 
 df = cargar_datos()
 
@@ -148,7 +144,7 @@ st.markdown("---")
 col1, col2 = st.columns([2, 1])
 
 with col1:
-    ventas_mes = df_f.groupby("mes")["ventas_total"].sum().reset_index()
+    ventas_mes = df_f.groupby("mes", observed=True)["ventas_total"].sum().reset_index()
     fig1 = px.bar(
         ventas_mes, x="mes", y="ventas_total",
         title="📅 Ventas por Mes",
@@ -160,7 +156,7 @@ with col1:
     st.plotly_chart(fig1, use_container_width=True)
 
 with col2:
-    ventas_region = df_f.groupby("region")["ventas_total"].sum().reset_index()
+    ventas_region = df_f.groupby("region", observed=True)["ventas_total"].sum().reset_index()
     fig2 = px.pie(
         ventas_region, values="ventas_total", names="region",
         title="🌎 Ventas por Región",
@@ -172,7 +168,7 @@ with col2:
 col3, col4 = st.columns(2)
 
 with col3:
-    ventas_prod = df_f.groupby("producto")["ventas_total"].sum().sort_values(ascending=True).reset_index()
+    ventas_prod = df_f.groupby("producto", observed=True)["ventas_total"].sum().sort_values(ascending=True).reset_index()
     fig3 = px.bar(
         ventas_prod, x="ventas_total", y="producto",
         orientation="h",
@@ -185,7 +181,7 @@ with col3:
     st.plotly_chart(fig3, use_container_width=True)
 
 with col4:
-    vend_ranking = df_f.groupby("vendedor").agg(
+    vend_ranking = df_f.groupby("vendedor", observed=True).agg(
         ventas=("ventas_total", "sum"),
         ganancia=("ganancia", "sum")
     ).reset_index().sort_values("ventas", ascending=False)
@@ -203,7 +199,7 @@ with col4:
 col5, col6 = st.columns([1, 2])
 
 with col5:
-    canal_data = df_f.groupby("canal")["ventas_total"].sum().reset_index()
+    canal_data = df_f.groupby("canal", observed=True)["ventas_total"].sum().reset_index()
     fig5 = px.pie(
         canal_data, values="ventas_total", names="canal",
         title="🛒 Ventas por Canal",
@@ -212,14 +208,23 @@ with col5:
     )
     st.plotly_chart(fig5, use_container_width=True)
 
-with col6:
+# Fragmento: ordenar o paginar vuelve a ejecutar solo la tabla, no todo el script
+@st.fragment
+def tabla_transacciones(df_f):
     st.subheader("📋 Detalle de Transacciones")
-    tabla = df_f[["fecha", "vendedor", "producto", "region", "unidades", "ventas_total", "ganancia", "margen_%"]].copy()
-    tabla["fecha"] = tabla["fecha"].dt.strftime("%Y-%m-%d")
-    tabla["ventas_total"] = tabla["ventas_total"].apply(lambda x: f"${x:,.0f}")
-    tabla["ganancia"] = tabla["ganancia"].apply(lambda x: f"${x:,.0f}")
-    tabla["margen_%"] = tabla["margen_%"].apply(lambda x: f"{x}%")
-    st.dataframe(tabla, use_container_width=True, height=300)
+    # Ordenar y paginar en el servidor: solo se formatea la página visible
+    c_orden, c_dir, c_filas, c_pag = st.columns([2, 1, 1, 1])
+    orden = c_orden.selectbox("Ordenar por", TABLE_SORT_COLUMNS)
+    ascendente = c_dir.selectbox("Dirección", ["Ascendente", "Descendente"]) == "Ascendente"
+    filas_pagina = c_filas.selectbox("Filas", TABLE_PAGE_SIZES)
+    num_paginas = max(-(-len(df_f) // filas_pagina), 1)
+    pagina = c_pag.number_input("Página", min_value=1, max_value=num_paginas, value=1, step=1)
+    tabla = paginate_transactions(df_f, orden, ascendente, int(pagina), filas_pagina)
+    st.dataframe(tabla, use_container_width=True, height=300, hide_index=True)
+    st.caption(f"{len(df_f):,} transacciones | página {int(pagina)} de {num_paginas}")
+
+with col6:
+    tabla_transacciones(df_f)
 
 # ─── FOOTER ───────────────────────────────────────────────
 st.markdown("---")
@@ -0,0 +1,263 @@
+"""
+Headless pipeline benchmark
+Times every pipeline stage without a browser and saves comparable results:
+
+    python benchmark.py --rows 1000000 --output bench_1m.json
+    python benchmark.py --rows 1000000 --compare bench_1m.json
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+from streamlit import config as streamlit_config
+from streamlit.logger import set_log_level
+
+# Pipeline modules run without a Streamlit server; silence bare-mode warnings
+streamlit_config.set_option("global.showWarningOnDirectExecution", False)
+set_log_level("error")
+
+from config import get_app_info, get_chart_settings
+from data_loader import read_sales_data, apply_filters, selection_mask, calculate_kpis, KPI_AGGREGATIONS
+from filter_index import build_filter_index
+from sales_cube import build_sales_cube, ROW_COUNT
+from sales_trend import build_time_index, sales_trend
+from aggregation_plan import build_plan, execute_plan
+from distinct_sketch import build_customer_sketches
+from goal_attainment import goal_attainment
+from meta_dashboard import render_goal_dashboard, GOAL_AGGREGATIONS
+from charts import (
+    render_charts_row1, render_charts_row2, render_charts_row3, render_transaction_table,
+    paginate_transactions, CHART_AGGREGATIONS, CUSTOMER_AGGREGATIONS
+)
+from figure_cache import get_figure_cache
+from top_k import top_k_ranking
+from generate_data import generate_sales_csv
+
+# Bump when stages change meaning so old result files are not compared blindly
+BENCHMARK_FORMAT_VERSION = 1
+
+# ─── MEASUREMENT ─────────────────────────────────────────────
+def measure(func, repeat=3):
+    """
+    Run func `repeat` times and return (result, best seconds, peak MB)
+    Peak memory comes from one extra tracemalloc run so tracing does not
+    inflate the timings
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, best, peak / 1e6
+
+def sample_selection(df, seed=0):
+    """A partial filter selection: roughly half of every dimension"""
+    rng = np.random.default_rng(seed)
+    selection = {}
+    for column in ["region", "categoria", "canal", "vendedor"]:
+        values = list(df[column].dropna().unique())
+        keep = max(len(values) // 2, 1)
+        selection[column] = [values[i] for i in sorted(rng.choice(len(values), keep, replace=False))]
+    return selection
+
+def run_benchmark(csv_path, repeat=3, workers=1):
+    """
+    Time each pipeline stage on a CSV and return a results dict
+    With workers > 1 the partitioned (multi-threaded) stages are timed too
+    """
+    stages = {}
+
+    def record(name, func, rows=None):
+        result, seconds, peak_mb = measure(func, repeat)
+        rows = len(result) if rows is None else rows
+        stages[name] = {
+            'seconds': round(seconds, 6),
+            'peak_mb': round(peak_mb, 3),
+            'rows': rows,
+            'rows_per_sec': round(rows / seconds) if seconds > 0 else None
+        }
+        return result
+
+    with tempfile.TemporaryDirectory() as snapshot_dir:
+        df = record("parse_csv", lambda: read_sales_data(csv_path, snapshot_dir, use_snapshot=False))
+        n_rows = len(df)
+
+        def snapshot_miss():
+            for name in os.listdir(snapshot_dir):
+                os.remove(os.path.join(snapshot_dir, name))
+            return read_sales_data(csv_path, snapshot_dir, use_snapshot=True)
+        record("snapshot_write", snapshot_miss, n_rows)
+        record("snapshot_read", lambda: read_sales_data(csv_path, snapshot_dir, use_snapshot=True), n_rows)
+
+    selection = sample_selection(df)
+    filter_args = (selection["region"], selection["categoria"], selection["canal"], selection["vendedor"])
+
+    filter_index = record("build_filter_index", lambda: build_filter_index(df), n_rows)
+    record("apply_filters_isin", lambda: apply_filters(df, *filter_args), n_rows)
+    filtered_df = record("apply_filters_index", lambda: apply_filters(df, *filter_args, index=filter_index), n_rows)
+
+    time_index = record("build_time_index", lambda: build_time_index(df), n_rows)
+    row_mask = selection_mask(filter_index, *filter_args)
+    record("sales_trend", lambda: sales_trend(time_index, row_mask), n_rows)
+
+    cube_frame = record("build_sales_cube", lambda: build_sales_cube(df), n_rows)
+    if workers > 1:
+        record("build_sales_cube_parallel", lambda: build_sales_cube(df, workers), n_rows)
+    cube = {'frame': cube_frame, 'index': build_filter_index(cube_frame)}
+    record("build_customer_sketches", lambda: build_customer_sketches(df), n_rows)
+
+    plan = build_plan({**KPI_AGGREGATIONS, **GOAL_AGGREGATIONS, **CHART_AGGREGATIONS})
+    record("aggregate_rows", lambda: execute_plan(plan, filtered_df), len(filtered_df))
+    if workers > 1:
+        record("aggregate_rows_parallel", lambda: execute_plan(plan, filtered_df, workers), len(filtered_df))
+
+    def aggregate_cube():
+        filtered_cube = apply_filters(cube['frame'], *filter_args, index=cube['index'])
+        return execute_plan(plan, filtered_cube)
+    aggregates = record("aggregate_cube", aggregate_cube, len(filtered_df))
+
+    record("calculate_kpis", lambda: calculate_kpis(filtered_df, aggregates=aggregates), len(filtered_df))
+    record("goal_attainment", lambda: goal_attainment(aggregates['salesperson_months']), len(filtered_df))
+    record(
+        "paginate_transactions",
+        lambda: paginate_transactions(filtered_df, "ventas_total", False, 1, 50),
+        len(filtered_df)
+    )
+
+    customer_ranking = top_k_ranking(
+        execute_plan(build_plan(CUSTOMER_AGGREGATIONS), filtered_df)['customer_sales'],
+        "cliente", "ventas_total", get_chart_settings()['top_k']['cliente']
+    )
+
+    def render_page():
+        # Fragment sections do not run outside a script run; time their bodies
+        render_goal_dashboard.__wrapped__(aggregates['salesperson_months'], selection["vendedor"])
+        render_charts_row1.__wrapped__(
+            aggregates['monthly_sales'], aggregates['regional_sales'], time_index, row_mask
+        )
+        render_charts_row2.__wrapped__(aggregates['product_sales'], aggregates['salesperson_sales'])
+        render_charts_row3.__wrapped__(
+            aggregates['channel_sales'], customer_ranking, filtered_df,
+            total_rows=aggregates['totals'][ROW_COUNT]
+        )
+        # The transaction table is a fragment nested in row 3, skipped above
+        render_transaction_table.__wrapped__(filtered_df, total_rows=aggregates['totals'][ROW_COUNT])
+
+    def render_page_cold():
+        get_figure_cache().clear()
+        render_page()
+    record("render_page", render_page_cold, len(filtered_df))
+    record("render_page_cached_figures", render_page, len(filtered_df))
+
+    return {
+        'meta': {
+            'format_version': BENCHMARK_FORMAT_VERSION,
+            'app_version': get_app_info()['version'],
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'csv': os.path.basename(csv_path),
+            'rows': n_rows,
+            'filtered_rows': len(filtered_df),
+            'repeat': repeat,
+            'workers': workers,
+            'timestamp': time.strftime("%Y-%m-%dT%H:%M:%S")
+        },
+        'stages': stages
+    }
+
+# ─── REPORTING ───────────────────────────────────────────────
+def compare_results(current, baseline, threshold=0.2):
+    """
+    Compare stage timings against a saved baseline
+    Returns rows of (stage, baseline s, current s, ratio, regressed)
+    """
+    rows = []
+    for stage, result in current['stages'].items():
+        before = baseline['stages'].get(stage)
+        if before is None or not before['seconds']:
+            rows.append((stage, None, result['seconds'], None, False))
+            continue
+        ratio = result['seconds'] / before['seconds']
+        rows.append((stage, before['seconds'], result['seconds'], ratio, ratio > 1 + threshold))
+    return rows
+
+def print_results(results):
+    """Print one line per stage"""
+    meta = results['meta']
+    print(f"{meta['rows']:,} rows ({meta['filtered_rows']:,} after filters), best of {meta['repeat']}")
+    print(f"{'stage':<26}{'seconds':>12}{'peak MB':>12}{'rows/sec':>16}")
+    for stage, result in results['stages'].items():
+        rate = f"{result['rows_per_sec']:,}" if result['rows_per_sec'] else "-"
+        print(f"{stage:<26}{result['seconds']:>12.4f}{result['peak_mb']:>12.1f}{rate:>16}")
+
+def print_comparison(rows, threshold):
+    """Print the comparison table and flag regressions above the threshold"""
+    print(f"\n{'stage':<26}{'baseline':>12}{'current':>12}{'ratio':>10}")
+    for stage, before, after, ratio, regressed in rows:
+        if ratio is None:
+            print(f"{stage:<26}{'-':>12}{after:>12.4f}{'new':>10}")
+            continue
+        flag = f"  REGRESSION (>{threshold:.0%})" if regressed else ""
+        print(f"{stage:<26}{before:>12.4f}{after:>12.4f}{ratio:>9.2f}x{flag}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the sales pipeline headlessly")
+    parser.add_argument("--csv", help="Existing CSV to benchmark (skips generation)")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--vendors", type=int, default=50)
+    parser.add_argument("--products", type=int, default=200)
+    parser.add_argument("--customers", type=int, default=5000)
+    parser.add_argument("--months", type=int, default=12)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=1, help="Also time partitioned stages with this many threads")
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    parser.add_argument("--compare", help="Baseline JSON file from an earlier run")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Allowed slowdown before flagging")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        csv_path = args.csv
+        if csv_path is None:
+            csv_path = os.path.join(workdir, f"ventas_{args.rows}.csv")
+            generate_sales_csv(
+                csv_path, args.rows, args.vendors, args.products, args.customers,
+                args.months, seed=args.seed
+            )
+        results = run_benchmark(csv_path, args.repeat, args.workers)
+
+    print_results(results)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as handle:
+            json.dump(results, handle, indent=2)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as handle:
+            baseline = json.load(handle)
+        if baseline['meta'].get('format_version') != BENCHMARK_FORMAT_VERSION:
+            print("Baseline was saved by a different benchmark format; timings may not match up")
+        if baseline['meta'].get('rows') != results['meta']['rows']:
+            print(f"Baseline has {baseline['meta'].get('rows'):,} rows; ratios are not like for like")
+        rows = compare_results(results, baseline, args.threshold)
+        print_comparison(rows, args.threshold)
+        if any(regressed for *_, regressed in rows):
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
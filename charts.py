@@ -1,36 +1,67 @@
+import numpy as np
+import pandas as pd
 import streamlit as st
 import plotly.express as px
 import plotly.graph_objects as go
-from config import get_theme_colors
+from config import get_theme_colors, get_chart_settings
+from instrumentation import instrumented, fragment
+from figure_cache import cached_figure
+from sales_trend import TREND_GRANULARITIES, sales_trend, time_index_from_months
+from compact_storage import measure_frame, standard_rows
+from top_k import top_k_ranking
 
-def render_monthly_sales(df):
-    """Render monthly sales bar chart"""
-    monthly_sales = df.groupby("mes")["ventas_total"].sum().reset_index()
-    
+# Aggregations the charts need, computed in one pass by aggregation_plan
+CHART_AGGREGATIONS = {
+    'monthly_sales': {'by': ["mes"], 'measures': ["ventas_total"]},
+    'regional_sales': {'by': ["region"], 'measures': ["ventas_total"]},
+    'product_sales': {'by': ["producto"], 'measures': ["ventas_total"]},
+    'salesperson_sales': {'by': ["vendedor"], 'measures': ["ventas_total", "ganancia"]},
+    'channel_sales': {'by': ["canal"], 'measures': ["ventas_total"]}
+}
+
+# Customers are not a cube dimension: ranked from the selected rows (or in SQL)
+CUSTOMER_AGGREGATIONS = {
+    'customer_sales': {'by': ["cliente"], 'measures': ["ventas_total"]}
+}
+
+# Trend chart wording per resolution: (title adjective, axis label)
+TREND_LABELS = {
+    'day': ("Daily", "Day"),
+    'week': ("Weekly", "Week"),
+    'month': ("Monthly", "Month"),
+    'quarter': ("Quarterly", "Quarter")
+}
+
+# ─── FIGURE BUILDERS ─────────────────────────────────────────
+# Pure functions of the aggregated tables, memoized by figure_cache
+def build_sales_trend_figure(trend, granularity, step):
+    """Sales trend bar chart at the resolution sales_trend() picked"""
+    adjective, axis_label = TREND_LABELS[granularity]
+    title = f"📅 {adjective} Sales Trend"
+    if step > 1:
+        title = f"📅 Sales Trend ({step}-{granularity} buckets)"
     fig = px.bar(
-        monthly_sales, x="mes", y="ventas_total",
-        title="📅 Monthly Sales Trend",
+        trend, x="periodo", y="ventas_total",
+        title=title,
         color="ventas_total",
         color_continuous_scale="Viridis",
-        labels={"ventas_total": "Sales ($)", "mes": "Month"}
+        labels={"ventas_total": "Sales ($)", "periodo": axis_label}
     )
     fig.update_layout(showlegend=False)
-    st.plotly_chart(fig, use_container_width=True)
+    return fig
 
-def render_regional_sales(df):
-    """Render regional sales pie chart"""
-    regional_sales = df.groupby("region")["ventas_total"].sum().reset_index()
-    
-    fig = px.pie(
+def build_regional_sales_figure(regional_sales):
+    """Regional sales pie chart"""
+    return px.pie(
         regional_sales, values="ventas_total", names="region",
         title="🌎 Sales by Region",
         hole=0.4
     )
-    st.plotly_chart(fig, use_container_width=True)
 
-def render_product_sales(df):
-    """Render horizontal product sales bar chart"""
-    product_sales = df.groupby("producto")["ventas_total"].sum().sort_values(ascending=True).reset_index()
+def build_product_sales_figure(product_sales):
+    """Horizontal product sales bar chart, in the given order from the top"""
+    # Plotly stacks horizontal categories bottom-up
+    product_sales = product_sales.iloc[::-1]
     
     fig = px.bar(
         product_sales, x="ventas_total", y="producto",
@@ -41,74 +72,258 @@ def render_product_sales(df):
         labels={"ventas_total": "Sales ($)", "producto": ""}
     )
     fig.update_layout(showlegend=False)
-    st.plotly_chart(fig, use_container_width=True)
-
-def render_salesperson_performance(df):
-    """Render salesperson performance comparison chart"""
-    salesperson_ranking = df.groupby("vendedor").agg(
-        sales=("ventas_total", "sum"),
-        profit=("ganancia", "sum")
-    ).reset_index().sort_values("sales", ascending=False)
+    return fig
+
+def build_salesperson_performance_figure(salesperson_sales):
+    """Salesperson sales vs profit grouped bars, in the given order"""
+    salesperson_ranking = salesperson_sales.rename(
+        columns={"ventas_total": "sales", "ganancia": "profit"}
+    )[["vendedor", "sales", "profit"]]
     
     colors = get_theme_colors()
-    fig = px.bar(
+    return px.bar(
         salesperson_ranking, x="vendedor", y=["sales", "profit"],
         title="👤 Sales vs Profit by Salesperson",
         barmode="group",
         labels={"value": "$", "vendedor": ""},
         color_discrete_map={"sales": colors['primary'], "profit": colors['secondary']}
     )
-    st.plotly_chart(fig, use_container_width=True)
 
-def render_channel_sales(df):
-    """Render sales channel pie chart"""
-    channel_data = df.groupby("canal")["ventas_total"].sum().reset_index()
+def build_customer_sales_figure(customer_sales):
+    """Horizontal top customers bar chart, in the given order from the top"""
+    fig = px.bar(
+        customer_sales.iloc[::-1], x="ventas_total", y="cliente",
+        orientation="h",
+        title="🤝 Top Customers",
+        color="ventas_total",
+        color_continuous_scale="Greens",
+        labels={"ventas_total": "Sales ($)", "cliente": ""}
+    )
+    fig.update_layout(showlegend=False)
+    return fig
+
+def build_channel_sales_figure(channel_data):
+    """Sales channel pie chart"""
     colors = get_theme_colors()
     
-    fig = px.pie(
+    return px.pie(
         channel_data, values="ventas_total", names="canal",
         title="🛒 Sales by Channel",
         hole=0.5,
         color_discrete_sequence=[colors['primary'], colors['secondary']]
     )
-    st.plotly_chart(fig, use_container_width=True)
 
-def render_transaction_table(df):
-    """Render detailed transaction table"""
-    st.subheader("📋 Transaction Details")
-    table = df[["fecha", "vendedor", "producto", "region", "unidades", "ventas_total", "ganancia", "margen_%"]].copy()
+# ─── CHART RENDERERS ─────────────────────────────────────────
+@instrumented
+def render_sales_trend(monthly_sales, time_index=None, row_mask=None):
+    """
+    Render the sales trend at day/week/month/quarter resolution
+    Uses the date-sorted time index when rows are loaded; without one
+    (streaming mode) the trend is built from the monthly aggregate
+    """
+    resolution = st.selectbox(
+        "Resolution", ["Auto"] + [name.title() for name in TREND_GRANULARITIES], key="trend_granularity"
+    ).lower()
+    finest = "day"
+    if time_index is None:
+        time_index, row_mask, finest = time_index_from_months(monthly_sales), None, "month"
+        if resolution in ("day", "week"):
+            resolution = "month"
+    trend, granularity, step = sales_trend(
+        time_index, row_mask, resolution, get_chart_settings()['trend_max_points'], finest
+    )
+    st.plotly_chart(cached_figure(build_sales_trend_figure, trend, granularity, step), use_container_width=True)
+
+@instrumented
+def render_regional_sales(regional_sales):
+    """Render regional sales pie chart"""
+    st.plotly_chart(cached_figure(build_regional_sales_figure, regional_sales), use_container_width=True)
+
+def ranking_caption(ranked, key, noun):
+    """Caption a top_k_ranking() result when values were rolled up into Other"""
+    k = get_chart_settings()['top_k'][key]
+    if ranked['values'] > k:
+        st.caption(f"Top {k} of {ranked['values']:,} {noun} by sales; the rest are summed in \"Other\"")
+
+def top_ranking(table, key, noun):
+    """
+    Top-K rows of an aggregate by sales (K from get_chart_settings), the rest
+    summed into "Other", with a caption when values were rolled up
+    """
+    ranked = top_k_ranking(table, key, "ventas_total", get_chart_settings()['top_k'][key])
+    ranking_caption(ranked, key, noun)
+    return ranked['ranking']
+
+@instrumented
+def render_product_sales(product_sales):
+    """Render horizontal product sales bar chart (top products)"""
+    ranking = top_ranking(product_sales, "producto", "products")
+    st.plotly_chart(cached_figure(build_product_sales_figure, ranking), use_container_width=True)
+
+@instrumented
+def render_salesperson_performance(salesperson_sales):
+    """Render salesperson performance comparison chart (top salespeople)"""
+    ranking = top_ranking(salesperson_sales, "vendedor", "salespeople")
+    st.plotly_chart(
+        cached_figure(build_salesperson_performance_figure, ranking),
+        use_container_width=True
+    )
+
+@instrumented
+def render_customer_sales(customer_ranking):
+    """
+    Render top customers bar chart
+    customer_ranking: a top_k_ranking() result, ranked where the rows are
+    (customers are not aggregated in full outside the database)
+    """
+    ranking_caption(customer_ranking, "cliente", "customers")
+    st.plotly_chart(
+        cached_figure(build_customer_sales_figure, customer_ranking['ranking']), use_container_width=True
+    )
+
+@instrumented
+def render_channel_sales(channel_data):
+    """Render sales channel pie chart"""
+    st.plotly_chart(cached_figure(build_channel_sales_figure, channel_data), use_container_width=True)
+
+# ─── TRANSACTION TABLE ────────────────────────────────────────
+TABLE_COLUMNS = ["fecha", "vendedor", "producto", "region", "unidades", "ventas_total", "ganancia", "margen_%"]
+TABLE_SORT_COLUMNS = ["fecha", "ventas_total", "ganancia", "margen_%", "unidades", "vendedor", "producto", "region"]
+TABLE_PAGE_SIZES = [25, 50, 100]
+
+def _sort_key(column, ascending):
+    """
+    Numeric sort key for a column (missing last)
+    Unordered categoricals sort by value: categories appended by incremental
+    loads come after the existing ones, so their codes are not alphabetical
+    """
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        codes = column.cat.codes.to_numpy()
+        categories = column.cat.categories
+        if column.cat.ordered:
+            rank = np.arange(len(categories), dtype=np.float64)
+        else:
+            rank = np.empty(len(categories), dtype=np.float64)
+            rank[categories.argsort()] = np.arange(len(categories))
+        key = rank[codes]
+        key[codes < 0] = np.nan
+    elif pd.api.types.is_datetime64_any_dtype(column):
+        key = column.to_numpy().astype("datetime64[ns]").astype(np.int64).astype(np.float64)
+        key[column.isna().to_numpy()] = np.nan
+    elif pd.api.types.is_numeric_dtype(column):
+        key = column.to_numpy(dtype=np.float64, na_value=np.nan)
+    else:
+        key = column.rank(method="dense").to_numpy(dtype=np.float64, na_value=np.nan)
+    if not ascending:
+        key = -key
+    return np.where(np.isnan(key), np.inf, key)
+
+def page_positions(column, ascending, start, stop):
+    """
+    Row positions of [start, stop) in a stable sort of the column
+    Early pages use a partial selection instead of sorting every row
+    """
+    key = _sort_key(column, ascending)
+    stop = min(stop, len(key))
+    if start >= stop:
+        return np.empty(0, dtype=np.int64)
+    if stop * 4 < len(key):
+        threshold = np.partition(key, stop - 1)[stop - 1]
+        below = np.flatnonzero(key < threshold)
+        ties = np.flatnonzero(key == threshold)[:stop - len(below)]
+        candidates = np.concatenate((below, ties))
+    else:
+        candidates = np.arange(len(key))
+    ordered = candidates[np.lexsort((candidates, key[candidates]))]
+    return ordered[start:stop]
+
+def format_money(values):
+    """Vectorized '$1,234' formatting (rounded half to even like f'{x:,.0f}')"""
+    digits = pd.Series(np.round(values.to_numpy(dtype=np.float64)), index=values.index)
+    text = digits.astype("Int64").astype(str).str.replace(r"\B(?=(\d{3})+(?!\d))", ",", regex=True)
+    return ("$" + text).where(digits.notna(), "$nan")
+
+def format_transaction_page(page):
+    """Format only the visible rows of the transaction table"""
+    table = standard_rows(page)[TABLE_COLUMNS].copy()
     table["fecha"] = table["fecha"].dt.strftime("%Y-%m-%d")
-    table["ventas_total"] = table["ventas_total"].apply(lambda x: f"${x:,.0f}")
-    table["ganancia"] = table["ganancia"].apply(lambda x: f"${x:,.0f}")
-    table["margen_%"] = table["margen_%"].apply(lambda x: f"{x}%")
-    st.dataframe(table, use_container_width=True, height=300)
+    table["ventas_total"] = format_money(table["ventas_total"])
+    table["ganancia"] = format_money(table["ganancia"])
+    table["margen_%"] = table["margen_%"].astype(str) + "%"
+    return table
+
+def paginate_transactions(df, sort_by, ascending, page, page_size):
+    """Return the formatted rows of one page, sorted server-side"""
+    start = (page - 1) * page_size
+    positions = page_positions(measure_frame(df, [sort_by])[sort_by], ascending, start, start + page_size)
+    return format_transaction_page(df.iloc[positions])
+
+@fragment
+@instrumented
+def render_transaction_table(df, total_rows=None):
+    """
+    Render the transaction table one server-side page at a time
+    A fragment: sorting and paging rerun only the table
+    """
+    st.subheader("📋 Transaction Details")
+    
+    col_sort, col_order, col_size, col_page = st.columns([2, 1, 1, 1])
+    with col_sort:
+        sort_by = st.selectbox("Sort by", TABLE_SORT_COLUMNS, key="table_sort_by")
+    with col_order:
+        ascending = st.selectbox("Order", ["Ascending", "Descending"], key="table_order") == "Ascending"
+    with col_size:
+        page_size = st.selectbox("Rows", TABLE_PAGE_SIZES, key="table_page_size")
+    n_pages = max(-(-len(df) // page_size), 1)
+    with col_page:
+        page = st.number_input("Page", min_value=1, max_value=n_pages, value=1, step=1, key="table_page")
+    
+    st.dataframe(
+        paginate_transactions(df, sort_by, ascending, int(page), page_size),
+        use_container_width=True, height=300, hide_index=True
+    )
+    
+    caption = f"{len(df):,} transactions | page {int(page)} of {n_pages}"
+    if total_rows is not None and total_rows > len(df):
+        caption = f"Showing the first {len(df):,} of {total_rows:,} transactions | page {int(page)} of {n_pages}"
+    st.caption(caption)
 
-def render_charts_row1(df):
-    """Render first row of charts: Monthly sales + Regional sales"""
+# Each row is a fragment that receives only the aggregates it draws, so a
+# widget inside it (trend resolution, table paging) reruns just that row
+@fragment
+def render_charts_row1(monthly_sales, regional_sales, time_index=None, row_mask=None):
+    """Render first row of charts: Sales trend + Regional sales"""
     col1, col2 = st.columns([2, 1])
     
     with col1:
-        render_monthly_sales(df)
+        render_sales_trend(monthly_sales, time_index, row_mask)
     
     with col2:
-        render_regional_sales(df)
+        render_regional_sales(regional_sales)
 
-def render_charts_row2(df):
+@fragment
+def render_charts_row2(product_sales, salesperson_sales):
     """Render second row of charts: Product sales + Salesperson performance"""
     col3, col4 = st.columns(2)
     
     with col3:
-        render_product_sales(df)
+        render_product_sales(product_sales)
     
     with col4:
-        render_salesperson_performance(df)
+        render_salesperson_performance(salesperson_sales)
 
-def render_charts_row3(df):
-    """Render third row: Channel sales + Transaction table"""
+@fragment
+def render_charts_row3(channel_sales, customer_ranking, df, total_rows=None):
+    """
+    Render third row: Channel sales and top customers + Transaction table (from the filtered rows)
+    The customer ranking needs rows or SQL, so customer_ranking is None in streaming mode
+    """
     col5, col6 = st.columns([1, 2])
     
     with col5:
-        render_channel_sales(df)
+        render_channel_sales(channel_sales)
+        if customer_ranking is not None:
+            render_customer_sales(customer_ranking)
     
     with col6:
-        render_transaction_table(df)
+        render_transaction_table(df, total_rows=total_rows)
@@ -0,0 +1,116 @@
+import argparse
+
+import numpy as np
+import pandas as pd
+
+# Metrics derived from the stored measures; compact frames compute them on demand
+DERIVED_COLUMNS = ["ganancia", "margen_%"]
+
+def _wide_dtypes(frame):
+    """64-bit dtypes for the downcast numeric columns of a frame"""
+    return {
+        col: np.float64 if pd.api.types.is_float_dtype(dtype) else np.int64
+        for col, dtype in frame.dtypes.items()
+        if pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype) and dtype.itemsize < 8
+    }
+
+def derive_metrics(df):
+    """ganancia and margen_% of each row, from ventas_total and costo_total"""
+    measures = df[["ventas_total", "costo_total"]]
+    measures = measures.astype(_wide_dtypes(measures))
+    profit = measures["ventas_total"] - measures["costo_total"]
+    return {'ganancia': profit, 'margen_%': (profit / measures["ventas_total"] * 100).round(1)}
+
+def month_codes(dates):
+    """Integer period code of each date's month (months since 1970-01)"""
+    return ((dates.dt.year - 1970) * 12 + dates.dt.month - 1).astype(np.int16)
+
+def month_categorical(codes):
+    """Month codes as a categorical of 'YYYY-MM' labels, categories in month order"""
+    codes = np.asarray(codes, dtype=np.int64)
+    if not len(codes):
+        return pd.Categorical([], categories=pd.Index([], dtype=str))
+    first = codes.min()
+    labels = pd.PeriodIndex.from_ordinals(np.arange(first, codes.max() + 1), freq="M").astype(str)
+    return pd.Categorical.from_codes(codes - first, categories=labels).remove_unused_categories()
+
+def is_month_code(column):
+    """Return True if a mes column holds integer period codes"""
+    return pd.api.types.is_integer_dtype(column.dtype)
+
+def compact_frame(df):
+    """
+    Compact storage of a processed sales frame
+    Strings are dictionary-encoded, numerics downcast where lossless and the
+    derived metrics dropped; mes is expected as month_codes already
+    """
+    df = df.drop(columns=[col for col in DERIVED_COLUMNS if col in df.columns])
+    for column in df.columns:
+        values = df[column]
+        if pd.api.types.is_string_dtype(values.dtype) or values.dtype == object:
+            df[column] = values.astype("category")
+        elif pd.api.types.is_integer_dtype(values.dtype):
+            df[column] = pd.to_numeric(values, downcast="integer")
+        elif pd.api.types.is_float_dtype(values.dtype):
+            narrow = values.astype(np.float32)
+            if np.array_equal(narrow.to_numpy(np.float64), values.to_numpy(np.float64), equal_nan=True):
+                df[column] = narrow
+    return df
+
+def measure_frame(df, columns):
+    """
+    df[columns] ready for aggregation
+    Derived metrics missing from a compact frame are computed here, and
+    downcast numerics are widened to 64 bits so sums keep full precision
+    """
+    missing = [col for col in columns if col in DERIVED_COLUMNS and col not in df.columns]
+    frame = df[[col for col in columns if col not in missing]]
+    if missing:
+        metrics = derive_metrics(df)
+        frame = frame.assign(**{col: metrics[col] for col in missing})[columns]
+    widen = _wide_dtypes(frame)
+    return frame.astype(widen) if widen else frame
+
+def standard_rows(df):
+    """
+    Rows in the standard layout (derived metrics, mes as 'YYYY-MM')
+    Meant for small frames such as a table page or an export chunk;
+    standard frames are returned unchanged
+    """
+    if "mes" not in df.columns or not is_month_code(df["mes"]):
+        return df
+    rows = df.assign(mes=month_categorical(df["mes"].to_numpy()).astype(str))
+    metrics = derive_metrics(rows)
+    return rows.assign(**{col: metrics[col] for col in DERIVED_COLUMNS})
+
+def memory_report(df):
+    """Deep memory use per column, largest first"""
+    usage = df.memory_usage(deep=True, index=False)
+    report = pd.DataFrame({
+        'column': usage.index,
+        'dtype': [str(df[col].dtype) for col in usage.index],
+        'bytes': usage.to_numpy(),
+        'bytes_per_row': usage.to_numpy() / max(len(df), 1)
+    })
+    report['share_%'] = (report['bytes'] / max(report['bytes'].sum(), 1) * 100).round(1)
+    return report.sort_values("bytes", ascending=False, ignore_index=True)
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare standard and compact memory use of a sales CSV")
+    parser.add_argument("--csv", default=None, help="Sales CSV (default: configured csv_path)")
+    args = parser.parse_args()
+
+    # Imported here: data_loader itself depends on this module
+    from data_loader import read_sales_data
+
+    reports = {}
+    for compact in (False, True):
+        df = read_sales_data(args.csv, use_snapshot=False, compact=compact)
+        reports[compact] = memory_report(df)
+        print(f"\n{'Compact' if compact else 'Standard'} ({len(df):,} rows)")
+        print(reports[compact].to_string(index=False))
+    standard, compact = reports[False]['bytes'].sum(), reports[True]['bytes'].sum()
+    print(f"\nTotal: {standard / 2**20:,.1f} MB -> {compact / 2**20:,.1f} MB ({standard / max(compact, 1):.1f}x smaller)")
+
+if __name__ == "__main__":
+    main()
@@ -31,3 +31,79 @@ def get_app_info():
         'version': "2.0.0",
         'logo_url': "https://img.icons8.com/color/96/combo-chart.png"
     }
+
+def get_data_settings():
+    """Return data source and snapshot settings"""
+    return {
+        'csv_path': "ventas_data.csv",
+        # "pandas": load the CSV into memory (default)
+        # "sqlite": run filters and group-bys in a local SQLite database,
+        # imported from the CSV on first use when the file is missing
+        'backend': "pandas",
+        'database_path': "ventas_data.sqlite",
+        'snapshot_dir': ".snapshots",
+        'use_snapshot': True,
+        # "snapshot": reload the whole file when it changes
+        # "incremental": parse only rows appended since the last rerun
+        # "streaming": aggregate the CSV chunk by chunk, never holding all rows
+        'ingest_mode': "snapshot",
+        # Seconds between background checks of the CSV in snapshot mode;
+        # 0 checks on every rerun instead (the rerun then pays the reload)
+        'refresh_interval_seconds': 30,
+        'chunk_rows': 250_000,
+        # Snapshot mode only: dictionary-encoded strings, lossless downcasts,
+        # mes as an integer period code; ganancia and margen_% are derived
+        # on demand inside aggregations instead of stored per row
+        'compact_memory': False,
+        'detail_row_limit': 1_000,
+        # "exact": count distinct customers over the filtered rows
+        # "sketch": merge per-cell HyperLogLog sketches (exact for small cells)
+        'distinct_customers': "exact",
+        'sketch_precision': 12,
+        # Threads for month-partitioned aggregation (1 = single-threaded);
+        # smaller inputs stay serial since the pool overhead dominates
+        'parallel_workers': 1,
+        'parallel_min_rows': 200_000
+    }
+
+def get_cache_settings():
+    """Return limits of the shared result and figure caches"""
+    return {
+        'result_cache_entries': 256,
+        'result_cache_bytes': 64 * 1024 * 1024,
+        'figure_cache_entries': 128,
+        'figure_cache_bytes': 32 * 1024 * 1024
+    }
+
+def get_chart_settings():
+    """Return chart rendering limits"""
+    return {
+        # Most bars the sales trend sends to the browser; finer
+        # resolutions are merged into wider buckets beyond this
+        'trend_max_points': 120,
+        # Bars per ranking chart; the remaining values are summed into "Other"
+        'top_k': {'producto': 15, 'vendedor': 15, 'cliente': 10}
+    }
+
+def get_export_settings():
+    """Return data export settings"""
+    return {
+        # Rows read, converted and written per step; bounds export memory
+        'chunk_rows': 50_000,
+        # Exports are assembled in memory up to this size, then on disk
+        'spool_bytes': 16 * 1024 * 1024
+    }
+
+def get_instrumentation_settings():
+    """Return per-rerun stage instrumentation settings"""
+    return {
+        'enabled': True,
+        # One JSON line per stage and rerun, to log_path (stderr when None);
+        # off by default: the debug panel reads the in-memory profiler
+        'json_log': False,
+        'log_path': None,
+        # Offer the sidebar "Performance debug" toggle
+        'debug_panel': True,
+        # Also record tracemalloc allocation deltas and peaks (slower)
+        'trace_allocations': False
+    }
@@ -1,26 +1,417 @@
+import hashlib
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+from types import MappingProxyType
+
+import numpy as np
 import streamlit as st
 import pandas as pd
 
-@st.cache_data
-def load_sales_data():
+from config import get_data_settings
+from filter_index import build_filter_index, encode_dimensions, select_rows
+from sales_cube import CUBE_DIMENSIONS, build_sales_cube, cube_dimension_dictionary
+from aggregation_plan import build_plan, execute_plan, per_row_mean
+from distinct_sketch import build_customer_sketches, count_distinct_selection
+from sales_trend import build_time_index, date_bounds, date_slice, slice_time_index, daily_totals
+from parallel_engine import parallel_workers, count_unique
+from compact_storage import compact_frame, derive_metrics, measure_frame, month_codes, standard_rows
+from top_k import top_k_ranking
+from sales_source import SalesSource, SalesSelection, sidebar_selections
+
+# Bump whenever the derived columns change so old snapshots are rebuilt
+SNAPSHOT_FORMAT_VERSION = 2
+
+# Shared frames are read-only by convention; copy-on-write (always on from
+# pandas 3) keeps a chained write in one session from reaching the snapshot
+if int(pd.__version__.split(".")[0]) < 3:
+    pd.set_option("mode.copy_on_write", True)
+
+# ─── SNAPSHOT HELPERS ─────────────────────────────────────────
+def derive_sales_columns(df, compact=False):
     """
-    Load and process sales data
-    Apply date conversion BEFORE any grouping to prevent errors
+    Add the derived columns to a raw sales frame
+    Apply date conversion BEFORE any grouping to prevent errors.
+    compact: store mes as an integer period code, dictionary-encode every
+    string, downcast numerics and leave the metrics to be derived on demand
     """
-    df = pd.read_csv("ventas_data.csv")
-    
     # Convert dates BEFORE any grouping (critical to prevent errors)
     df["fecha"] = pd.to_datetime(df["fecha"])
+    if compact:
+        df["mes"] = month_codes(df["fecha"])
+        return encode_dimensions(compact_frame(df))
     df["mes"] = df["fecha"].dt.to_period("M").astype(str)
     
     # Calculate derived metrics
-    df["ganancia"] = df["ventas_total"] - df["costo_total"]
-    df["margen_%"] = (df["ganancia"] / df["ventas_total"] * 100).round(1)
+    metrics = derive_metrics(df)
+    df["ganancia"] = metrics["ganancia"]
+    df["margen_%"] = metrics["margen_%"]
+    
+    # Dictionary-encode the sidebar dimensions for the filter index
+    return encode_dimensions(df)
+
+class _BoundedReader(io.RawIOBase):
+    """Read-only view of a binary file that stops at a fixed byte offset"""
+    
+    def __init__(self, handle, end):
+        self._handle = handle
+        self._remaining = max(end - handle.tell(), 0)
+    
+    def readable(self):
+        return True
+    
+    def readinto(self, buffer):
+        size = min(len(buffer), self._remaining)
+        if size <= 0:
+            return 0
+        read = self._handle.readinto(memoryview(buffer)[:size])
+        self._remaining -= read
+        return read
+
+def read_csv_range(path, start, end, names=None):
+    """
+    Parse bytes [start, end) of a CSV file
+    Pass the header as `names` when start is not at the beginning of the file
+    """
+    with open(path, "rb") as handle:
+        handle.seek(start)
+        reader = io.BufferedReader(_BoundedReader(handle, end))
+        if names is None:
+            return pd.read_csv(reader)
+        return pd.read_csv(reader, header=None, names=names)
+
+def file_sha256(path, size=None, block_size=1 << 20):
+    """Return the SHA-256 hex digest of a file (or its first `size` bytes)"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as handle:
+        reader = io.BufferedReader(_BoundedReader(handle, size)) if size is not None else handle
+        for block in iter(lambda: reader.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _snapshot_paths(csv_path, snapshot_dir, compact=False):
+    """Return the (data, metadata) paths of the snapshot for a CSV file"""
+    stem = os.path.splitext(os.path.basename(csv_path))[0]
+    base = os.path.join(snapshot_dir, stem + (".compact" if compact else ""))
+    return base + ".parquet", base + ".meta.json"
+
+def _read_snapshot_meta(meta_path):
+    """Return the stored snapshot metadata, or None if missing/corrupt"""
+    try:
+        with open(meta_path, encoding="utf-8") as handle:
+            return json.load(handle)
+    except (OSError, ValueError):
+        return None
+
+def _snapshot_is_fresh(meta, csv_path, stat):
+    """
+    Check a snapshot against the source CSV
+    Size + mtime is the fast path; a changed mtime with the same size
+    falls back to the content hash (e.g. a file that was only touched)
+    """
+    if meta is None or meta.get("format_version") != SNAPSHOT_FORMAT_VERSION:
+        return False
+    if meta.get("size") != stat.st_size:
+        return False
+    if meta.get("mtime_ns") == stat.st_mtime_ns:
+        return True
+    return meta.get("sha256") == file_sha256(csv_path, stat.st_size)
+
+def _temp_path(path):
+    """
+    A unique temporary file beside `path`, to os.replace() into place
+    Unique per writer, so concurrent writers never share a partial file
+    """
+    handle, tmp_path = tempfile.mkstemp(
+        dir=os.path.dirname(path) or ".", prefix=os.path.basename(path) + ".", suffix=".tmp"
+    )
+    os.close(handle)
+    return tmp_path
+
+def _write_snapshot_meta(meta, meta_path):
+    """Replace the snapshot metadata file atomically"""
+    tmp_meta = _temp_path(meta_path)
+    try:
+        with open(tmp_meta, "w", encoding="utf-8") as handle:
+            json.dump(meta, handle)
+        os.replace(tmp_meta, meta_path)
+    finally:
+        if os.path.exists(tmp_meta):
+            os.remove(tmp_meta)
+
+def _write_snapshot(df, csv_path, stat, data_path, meta_path):
+    """Write the snapshot and its metadata atomically"""
+    os.makedirs(os.path.dirname(data_path) or ".", exist_ok=True)
+    meta = {
+        'format_version': SNAPSHOT_FORMAT_VERSION,
+        'source': os.path.abspath(csv_path),
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'sha256': file_sha256(csv_path, stat.st_size),
+        'rows': len(df)
+    }
+    tmp_data = _temp_path(data_path)
+    try:
+        df.to_parquet(tmp_data, index=False)
+        # Data first, metadata last: a crash in between leaves a stale
+        # metadata file that simply fails the freshness check
+        os.replace(tmp_data, data_path)
+    finally:
+        if os.path.exists(tmp_data):
+            os.remove(tmp_data)
+    _write_snapshot_meta(meta, meta_path)
+    return meta
+
+# ─── DATA LOADING ─────────────────────────────────────────────
+def read_sales_data(csv_path=None, snapshot_dir=None, use_snapshot=None, compact=None):
+    """
+    Load and process sales data without Streamlit caching
+    Reuses the columnar snapshot when the source CSV is unchanged and
+    records the outcome in df.attrs["load_info"]. compact defaults to the
+    compact_memory setting (compact frames keep their own snapshot).
+    """
+    settings = get_data_settings()
+    csv_path = csv_path or settings['csv_path']
+    snapshot_dir = snapshot_dir or settings['snapshot_dir']
+    if use_snapshot is None:
+        use_snapshot = settings['use_snapshot']
+    if compact is None:
+        compact = settings['compact_memory']
+    
+    start = time.perf_counter()
+    stat = os.stat(csv_path)
+    data_path, meta_path = _snapshot_paths(csv_path, snapshot_dir, compact)
     
+    status = "disabled"
+    meta = None
+    if use_snapshot:
+        meta = _read_snapshot_meta(meta_path)
+        if _snapshot_is_fresh(meta, csv_path, stat):
+            try:
+                df = pd.read_parquet(data_path)
+                status = "hit"
+            except (OSError, ValueError):
+                status = "miss"
+            if status == "hit" and meta["mtime_ns"] != stat.st_mtime_ns:
+                # Matched by content hash (touched or copied file): record the
+                # new mtime so later loads take the fast path again
+                meta = {**meta, 'mtime_ns': stat.st_mtime_ns}
+                try:
+                    _write_snapshot_meta(meta, meta_path)
+                except OSError:
+                    pass
+        else:
+            status = "miss"
+    
+    if status != "hit":
+        # Parse exactly the bytes that were stat'ed so the snapshot metadata
+        # (and any later incremental ingest) matches the parsed rows
+        df = derive_sales_columns(read_csv_range(csv_path, 0, stat.st_size), compact)
+        if use_snapshot:
+            try:
+                meta = _write_snapshot(df, csv_path, stat, data_path, meta_path)
+            except OSError:
+                # Read-only deployments still work, just without a snapshot
+                meta = None
+    
+    df.attrs["load_info"] = {
+        'snapshot': status,
+        'source': csv_path,
+        'sha256': meta.get("sha256") if meta else None,
+        'data_version': meta["sha256"][:16] if meta else f"{stat.st_size}-{stat.st_mtime_ns}",
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'rows': len(df),
+        'compact': compact,
+        'seconds': round(time.perf_counter() - start, 3)
+    }
     return df
 
-def apply_filters(df, regions, categories, channels, salespeople):
-    """Apply selected filters to DataFrame"""
+# ─── SHARED DATASET ───────────────────────────────────────────
+def _freeze(value):
+    """Mark every numpy array in a nested dict/list structure read-only"""
+    if isinstance(value, np.ndarray):
+        value.flags.writeable = False
+    elif isinstance(value, dict):
+        for item in value.values():
+            _freeze(item)
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            _freeze(item)
+    return value
+
+def build_shared_dataset(df, version):
+    """
+    Build an immutable dataset snapshot: the frame plus every structure
+    derived from it (filter and time indexes, cube, sidebar dimension
+    dictionary, optional sketches)
+    """
+    settings = get_data_settings()
+    load_info = df.attrs["load_info"]
+    load_info['version'] = version
+    load_info['data_version'] = f"v{version}-{load_info['data_version']}"
+    
+    cube = build_sales_cube(df, parallel_workers(len(df)))
+    sketches = None
+    if settings['distinct_customers'] == "sketch":
+        sketches = build_customer_sketches(df, settings['sketch_precision'])
+    return MappingProxyType({
+        'version': version,
+        'frame': df,
+        'filter_index': _freeze(build_filter_index(df)),
+        'time_index': _freeze(build_time_index(df)),
+        'cube': _freeze({'frame': cube, 'index': build_filter_index(cube)}),
+        'dimensions': _freeze(cube_dimension_dictionary(cube)),
+        'customer_sketches': _freeze(sketches),
+        'source_stat': (load_info['size'], load_info['mtime_ns'])
+    })
+
+class SharedSalesData:
+    """
+    Process-wide, read-only dataset shared by every session without copies
+    A rerun keeps the snapshot it got for its whole run; a reload builds
+    the next snapshot aside and swaps the reference in one assignment, so
+    in-flight reruns keep a consistent view. Frames rely on pandas
+    copy-on-write: filtering and slicing never write back to the snapshot.
+    With a background refresher running, reruns never reload themselves
+    (stale-while-revalidate): they get the latest published snapshot.
+    """
+    
+    def __init__(self, csv_path=None, compact=None):
+        self._csv_path = csv_path
+        self._compact = compact
+        self._reload_lock = threading.Lock()
+        self._snapshot = None
+        self._version = 0
+        self._refresher = None
+        self._stop = threading.Event()
+        self.last_error = None
+    
+    def current(self):
+        """The latest published snapshot (None before the first load)"""
+        return self._snapshot
+    
+    def refresh(self):
+        """
+        Return the current snapshot, reloading it first if the CSV changed
+        While another session (or the refresher) reloads, the previous
+        snapshot is served; only the very first load blocks
+        """
+        snapshot = self._snapshot
+        if snapshot is not None and self._refresher is not None:
+            return snapshot
+        return self._revalidate(blocking=snapshot is None)
+    
+    def _revalidate(self, blocking):
+        """Reload if the CSV's size or mtime changed; without blocking, skip when busy"""
+        csv_path = self._csv_path or get_data_settings()['csv_path']
+        snapshot = self._snapshot
+        stat = os.stat(csv_path)
+        if snapshot is not None and snapshot['source_stat'] == (stat.st_size, stat.st_mtime_ns):
+            return snapshot
+        if not self._reload_lock.acquire(blocking=blocking):
+            return snapshot
+        try:
+            return self._reload(csv_path)
+        finally:
+            self._reload_lock.release()
+    
+    def _reload(self, csv_path):
+        """Load the CSV and publish a new snapshot if its content changed"""
+        snapshot = self._snapshot
+        stat = os.stat(csv_path)
+        if snapshot is not None and snapshot['source_stat'] == (stat.st_size, stat.st_mtime_ns):
+            # Another session reloaded while this one waited
+            return snapshot
+        
+        start = time.perf_counter()
+        df = read_sales_data(csv_path, compact=self._compact)
+        load_info = df.attrs["load_info"]
+        if snapshot is not None and load_info['sha256'] and load_info['sha256'] == snapshot['frame'].attrs["load_info"]['sha256']:
+            # Touched but unchanged: keep the data (and its version)
+            self._snapshot = MappingProxyType({**snapshot, 'source_stat': (load_info['size'], load_info['mtime_ns'])})
+        else:
+            self._version += 1
+            next_snapshot = build_shared_dataset(df, self._version)
+            # Load time covers the derived structures too
+            load_info['seconds'] = round(time.perf_counter() - start, 3)
+            load_info['loaded_at'] = time.strftime("%Y-%m-%d %H:%M:%S")
+            self._snapshot = next_snapshot
+        return self._snapshot
+    
+    def start_refresher(self, interval):
+        """Revalidate the CSV every `interval` seconds on a daemon thread"""
+        if self._refresher is not None or interval <= 0:
+            return
+        self._refresher = threading.Thread(
+            target=self._watch, args=(interval,), name="sales-data-refresher", daemon=True
+        )
+        self._refresher.start()
+    
+    def stop_refresher(self):
+        """Stop the background refresher; reruns revalidate themselves again"""
+        if self._refresher is None:
+            return
+        self._stop.set()
+        self._refresher.join()
+        self._refresher = None
+        self._stop.clear()
+    
+    def _watch(self, interval):
+        """Refresher loop: a failed reload keeps the current snapshot published"""
+        while not self._stop.wait(interval):
+            try:
+                self._revalidate(blocking=True)
+                self.last_error = None
+            except Exception as error:
+                self.last_error = f"{type(error).__name__}: {error}"
+
+@st.cache_resource
+def _shared_sales_data(compact):
+    """One dataset holder per storage layout"""
+    shared = SharedSalesData(compact=compact)
+    shared.start_refresher(get_data_settings()['refresh_interval_seconds'])
+    return shared
+
+def get_shared_sales_data(compact=None):
+    """
+    Shared dataset holder for every session of this process
+    compact defaults to the compact_memory setting
+    """
+    if compact is None:
+        compact = get_data_settings()['compact_memory']
+    return _shared_sales_data(compact)
+
+def load_sales_data(compact=None):
+    """
+    Load and process sales data
+    Returns the shared read-only frame: callers must not modify it in place
+    """
+    return get_shared_sales_data(compact).refresh()['frame']
+
+def selection_mask(index, regions, categories, channels, salespeople):
+    """Boolean row mask of a sidebar selection, or None when nothing is filtered out"""
+    return select_rows(index, sidebar_selections(regions, categories, channels, salespeople))
+
+def apply_filters(df, regions, categories, channels, salespeople, index=None, date_range=None):
+    """
+    Apply selected filters to DataFrame
+    With a filter index, selections are resolved from precomputed row ids
+    and dimensions with every value selected are skipped entirely.
+    date_range: inclusive (start, end) dates; loaded frames are cheaper to
+    slice with their time index (sales_trend.date_slice)
+    """
+    if date_range is not None:
+        start, end = pd.Timestamp(date_range[0]), pd.Timestamp(date_range[1]) + pd.Timedelta(days=1)
+        df = df[(df["fecha"] >= start) & (df["fecha"] < end)]
+        return apply_filters(df, regions, categories, channels, salespeople)
+    if index is not None:
+        mask = selection_mask(index, regions, categories, channels, salespeople)
+        return df if mask is None else df[mask]
+    
     return df[
         df["region"].isin(regions) &
         df["categoria"].isin(categories) &
@@ -28,13 +419,121 @@ def apply_filters(df, regions, categories, channels, salespeople):
         df["vendedor"].isin(salespeople)
     ]
 
-def calculate_kpis(df):
-    """Calculate main KPIs"""
+# Totals calculate_kpis reads from a precomputed aggregation plan
+KPI_AGGREGATIONS = {
+    'kpi_totals': {
+        'by': [],
+        'measures': ["ventas_total", "ganancia", "margen_%", "unidades"]
+    },
+    # Monthly targets repeat on every row: count each salesperson-month once
+    'kpi_targets': {'by': ["vendedor", "mes"], 'measures': [], 'max_measures': ["meta_mensual_max"]},
+    # Per-month totals behind the MoM/YoY deltas (sales_trend.build_month_prefix)
+    'kpi_monthly': {'by': ["mes"], 'measures': ["ventas_total", "ganancia", "margen_%", "unidades"]}
+}
+
+def calculate_kpis(df, aggregates=None, unique_customers=None, workers=1):
+    """
+    Calculate main KPIs
+    With precomputed aggregates, only the distinct customer count still
+    reads df, which may be any frame holding the filtered `cliente` values;
+    pass unique_customers (e.g. from sketches) to skip that scan too.
+    With workers > 1 that count is deduplicated in parallel chunks.
+    """
+    if aggregates is None:
+        measures = measure_frame(df, ["ventas_total", "ganancia", "margen_%", "unidades"])
+        return {
+            'total_sales': measures["ventas_total"].sum(),
+            'total_profit': measures["ganancia"].sum(),
+            'avg_margin': measures["margen_%"].mean(),
+            'total_units': measures["unidades"].sum(),
+            'unique_customers': count_unique(df["cliente"], workers),
+            'total_target': df.groupby(["vendedor", "mes"], observed=True)["meta_mensual"].max().sum()
+        }
+    
+    totals = aggregates['kpi_totals']
     return {
-        'total_sales': df["ventas_total"].sum(),
-        'total_profit': df["ganancia"].sum(),
-        'avg_margin': df["margen_%"].mean(),
-        'total_units': df["unidades"].sum(),
-        'unique_customers': df["cliente"].nunique(),
-        'total_target': df["meta_mensual"].sum()
+        'total_sales': totals["ventas_total"],
+        'total_profit': totals["ganancia"],
+        'avg_margin': per_row_mean(totals, "margen_%"),
+        'total_units': totals["unidades"],
+        'unique_customers': count_unique(df["cliente"], workers) if unique_customers is None else unique_customers,
+        'total_target': aggregates['kpi_targets']["meta_mensual_max"].sum()
     }
+
+# ─── DATA SOURCE ──────────────────────────────────────────────
+class FrameSalesSource(SalesSource):
+    """
+    The default source: a dataset held in memory
+    dataset: a SharedSalesData snapshot or an incremental_loader state
+    (frame, filter and time indexes, sales cube, optional sketches)
+    """
+    
+    def __init__(self, dataset, refresh_error=None):
+        self.dataset = dataset
+        self.frame = dataset['frame']
+        self.dimensions = dataset['dimensions']
+        self.date_bounds = date_bounds(dataset['time_index'])
+        self.load_info = self.frame.attrs.get("load_info", {})
+        self.refresh_error = refresh_error
+    
+    def where(self, regions, categories, channels, salespeople, date_range=None):
+        return FrameSelection(self.dataset, sidebar_selections(regions, categories, channels, salespeople), date_range)
+
+class FrameSelection(SalesSelection):
+    """
+    Selected rows of an in-memory dataset, resolved through its indexes
+    The filter index gives the row mask and a date range is a contiguous
+    run of the date-sorted time index; plans over cube dimensions are
+    answered from the cube without touching the rows
+    """
+    
+    def __init__(self, dataset, selections, date_range=None):
+        self.dataset = dataset
+        self.selections = selections
+        self.date_range = date_range
+        frame, time_index = dataset['frame'], dataset['time_index']
+        self.row_mask = select_rows(dataset['filter_index'], selections)
+        self.positions = None
+        if date_range is None:
+            self.rows = frame if self.row_mask is None else frame[self.row_mask]
+        else:
+            date_lo, date_hi = date_slice(time_index, *date_range)
+            positions = np.sort(time_index['order'][date_lo:date_hi])
+            if self.row_mask is not None:
+                positions = positions[self.row_mask[positions]]
+            self.positions = positions
+            self.rows = frame.take(positions)
+            time_index = slice_time_index(time_index, date_lo, date_hi)
+        self.time_index = time_index
+    
+    def execute_plan(self, plan):
+        source = self.rows
+        if self.date_range is None and set(plan['keys']) <= set(CUBE_DIMENSIONS):
+            cube = self.dataset['cube']
+            mask = select_rows(cube['index'], self.selections)
+            source = cube['frame'] if mask is None else cube['frame'][mask]
+        return execute_plan(plan, source, parallel_workers(len(source)))
+    
+    def count_distinct(self, column):
+        sketches = self.dataset['customer_sketches']
+        if column == "cliente" and sketches is not None and self.date_range is None:
+            # Merged per-cell sketches, no row scan
+            return count_distinct_selection(sketches, self.selections)
+        return count_unique(self.rows[column], parallel_workers(len(self.rows)))
+    
+    def top_k(self, key, by, k):
+        ranked = self.execute_plan(build_plan({'ranking': {'by': [key], 'measures': [by]}}))['ranking']
+        return top_k_ranking(ranked, key, by, k)
+    
+    def daily_sales(self):
+        return daily_totals(self.time_index, self.row_mask)
+    
+    def detail_rows(self):
+        return self.rows
+    
+    def iter_rows(self, chunk_rows):
+        positions = self.positions
+        if positions is None:
+            positions = np.arange(len(self.dataset['frame'])) if self.row_mask is None else np.flatnonzero(self.row_mask)
+        for start in range(0, len(positions), chunk_rows):
+            yield standard_rows(self.dataset['frame'].take(positions[start:start + chunk_rows]))
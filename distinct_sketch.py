@@ -0,0 +1,156 @@
+import numpy as np
+import pandas as pd
+
+from filter_index import FILTER_DIMENSIONS, build_filter_index, select_rows
+from sales_cube import union_categories
+
+# Sketch grain: any sidebar selection maps to a set of cells, and "mes"
+# lets the same sketches answer per-month customer counts
+SKETCH_KEYS = FILTER_DIMENSIONS + ["mes"]
+
+def hash_values(values):
+    """Deterministic 64-bit hashes (identical across processes and partitions)"""
+    codes, uniques = pd.factorize(pd.Series(values), use_na_sentinel=False)
+    return pd.util.hash_array(np.asarray(uniques, dtype=object))[codes]
+
+def _bit_length(values):
+    """Vectorized bit length of uint64 values"""
+    values = values.copy()
+    length = np.zeros(len(values), dtype=np.uint8)
+    for shift in (32, 16, 8, 4, 2, 1):
+        high = values >= np.uint64(1 << shift)
+        length[high] += shift
+        values[high] >>= np.uint64(shift)
+    return length + (values > 0)
+
+def _register_updates(hashes, precision):
+    """Register index and rank (leading zeros + 1) of each hash"""
+    width = 64 - precision
+    registers = (hashes >> np.uint64(width)).astype(np.int64)
+    remainder = hashes & np.uint64((1 << width) - 1)
+    return registers, (width - _bit_length(remainder) + 1).astype(np.uint8)
+
+def estimate_cardinality(registers):
+    """HyperLogLog estimate with the small-range (linear counting) correction"""
+    m = len(registers)
+    alpha = {16: 0.673, 32: 0.697, 64: 0.709}.get(m, 0.7213 / (1 + 1.079 / m))
+    estimate = alpha * m * m / np.sum(np.ldexp(1.0, -registers.astype(np.int64)))
+    zeros = np.count_nonzero(registers == 0)
+    if estimate <= 2.5 * m and zeros:
+        estimate = m * np.log(m / zeros)
+    return int(round(estimate))
+
+def _assemble(keys, pair_cells, pair_hashes, dense_cells, dense_registers, precision, sparse_limit):
+    """
+    Build a sketch set from (cell, hash) pairs and existing dense registers
+    Cells with at most `sparse_limit` distinct hashes keep them exactly;
+    larger cells are folded into 2**precision one-byte registers
+    """
+    pairs = pd.DataFrame({'cell': pair_cells, 'hash': pair_hashes}).drop_duplicates()
+    cells = pairs["cell"].to_numpy()
+    hashes = pairs["hash"].to_numpy(dtype=np.uint64)
+    
+    is_dense = np.bincount(cells, minlength=len(keys)) > sparse_limit
+    is_dense[dense_cells] = True
+    dense_ids = np.flatnonzero(is_dense)
+    dense_pos = np.full(len(keys), -1, dtype=np.int64)
+    dense_pos[dense_ids] = np.arange(len(dense_ids))
+    
+    registers = np.zeros((len(dense_ids), 1 << precision), dtype=np.uint8)
+    if len(dense_cells):
+        np.maximum.at(registers, dense_pos[dense_cells], dense_registers)
+    to_dense = is_dense[cells]
+    slots, ranks = _register_updates(hashes[to_dense], precision)
+    np.maximum.at(registers, (dense_pos[cells[to_dense]], slots), ranks)
+    
+    order = np.argsort(cells[~to_dense], kind="stable")
+    return {
+        'keys': keys,
+        'index': build_filter_index(keys),
+        'precision': precision,
+        'sparse_limit': sparse_limit,
+        'hash_cells': cells[~to_dense][order],
+        'hashes': hashes[~to_dense][order],
+        'dense_pos': dense_pos,
+        'registers': registers
+    }
+
+def _cell_keys(frame, keys=SKETCH_KEYS):
+    """Categorical key columns of a frame"""
+    key_frame = frame[keys].copy()
+    for key in keys:
+        if not isinstance(key_frame[key].dtype, pd.CategoricalDtype):
+            key_frame[key] = key_frame[key].astype("category")
+    return key_frame
+
+def _factorize_cells(key_frame):
+    """Cell id per row and the key table (one row per cell)"""
+    cells = key_frame.groupby(list(key_frame.columns), observed=True, dropna=False, sort=False).ngroup().to_numpy()
+    _, first_rows = np.unique(cells, return_index=True)
+    return cells, key_frame.iloc[first_rows].reset_index(drop=True)
+
+def build_customer_sketches(df, precision=12, sparse_limit=None):
+    """Build distinct-customer sketches per SKETCH_KEYS cell from transaction rows"""
+    sparse_limit = (1 << precision) // 8 if sparse_limit is None else sparse_limit
+    cells, keys = _factorize_cells(_cell_keys(df))
+    return _assemble(
+        keys, cells, hash_values(df["cliente"]),
+        np.empty(0, dtype=np.int64), np.empty((0, 1 << precision), dtype=np.uint8),
+        precision, sparse_limit
+    )
+
+def merge_sketches(sketch, other):
+    """Merge two sketch sets (e.g. two partitions or an appended tail)"""
+    if sketch['precision'] != other['precision']:
+        raise ValueError("Cannot merge sketches with different precision")
+    left, right = sketch['keys'].copy(), other['keys'].copy()
+    for key in left.columns:
+        categories = union_categories(left[key], right[key])
+        left[key] = left[key].cat.set_categories(categories)
+        right[key] = right[key].cat.set_categories(categories)
+    cells, keys = _factorize_cells(pd.concat([left, right], ignore_index=True))
+    remap_left, remap_right = cells[:len(left)], cells[len(left):]
+    
+    dense_left = np.flatnonzero(sketch['dense_pos'] >= 0)
+    dense_right = np.flatnonzero(other['dense_pos'] >= 0)
+    return _assemble(
+        keys,
+        np.concatenate((remap_left[sketch['hash_cells']], remap_right[other['hash_cells']])),
+        np.concatenate((sketch['hashes'], other['hashes'])),
+        np.concatenate((remap_left[dense_left], remap_right[dense_right])),
+        np.concatenate((sketch['registers'][sketch['dense_pos'][dense_left]],
+                        other['registers'][other['dense_pos'][dense_right]])),
+        sketch['precision'], sketch['sparse_limit']
+    )
+
+def count_distinct(sketch, cell_mask=None):
+    """
+    Distinct customers over the selected cells (all cells when mask is None)
+    Exact while every selected cell is still sparse, HyperLogLog otherwise
+    """
+    selected = np.ones(len(sketch['keys']), dtype=bool) if cell_mask is None else cell_mask
+    hashes = sketch['hashes'][selected[sketch['hash_cells']]]
+    dense = sketch['dense_pos'][selected]
+    dense = dense[dense >= 0]
+    if not len(dense):
+        return len(np.unique(hashes))
+    
+    merged = sketch['registers'][dense].max(axis=0)
+    slots, ranks = _register_updates(hashes, sketch['precision'])
+    np.maximum.at(merged, slots, ranks)
+    return estimate_cardinality(merged)
+
+def count_distinct_selection(sketch, selections):
+    """Distinct customers for a {dimension: selected values} sidebar selection"""
+    return count_distinct(sketch, select_rows(sketch['index'], selections))
+
+def count_distinct_by(sketch, by, cell_mask=None):
+    """Distinct customers per value of a sketch key (e.g. 'region' or 'mes')"""
+    selected = np.ones(len(sketch['keys']), dtype=bool) if cell_mask is None else cell_mask
+    groups = sketch['keys'][by].cat.codes.to_numpy()
+    rows = []
+    for code, value in enumerate(sketch['keys'][by].cat.categories):
+        group_mask = selected & (groups == code)
+        if group_mask.any():
+            rows.append({by: value, 'clientes': count_distinct(sketch, group_mask)})
+    return pd.DataFrame(rows, columns=[by, 'clientes'])
@@ -0,0 +1,113 @@
+import tempfile
+
+import streamlit as st
+from openpyxl import Workbook
+
+from config import get_export_settings
+from charts import CHART_AGGREGATIONS
+from instrumentation import instrumented, fragment
+
+# {label: (file extension, MIME type)}
+EXPORT_FORMATS = {
+    'CSV': ("csv", "text/csv"),
+    'Excel': ("xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+}
+
+TRANSACTIONS = "Transactions"
+
+# Data rows per worksheet (Excel's limit is 1,048,576 rows, one is the header)
+XLSX_MAX_ROWS = 1_048_575
+
+def chart_tables(aggregates):
+    """Aggregated chart tables {sheet name: frame}, without the helper counts"""
+    return {
+        name.replace("_", " ").capitalize(): aggregates[name][spec['by'] + spec['measures']]
+        for name, spec in CHART_AGGREGATIONS.items()
+    }
+
+def _spool():
+    """Binary buffer that moves to a temporary file beyond spool_bytes"""
+    return tempfile.SpooledTemporaryFile(max_size=get_export_settings()['spool_bytes'])
+
+def write_csv(chunks):
+    """Write frame chunks as one CSV; returns the file rewound for reading"""
+    output = _spool()
+    header = True
+    for chunk in chunks:
+        output.write(chunk.to_csv(index=False, header=header).encode("utf-8"))
+        header = False
+    output.seek(0)
+    return output
+
+def _xlsx_values(chunk):
+    """Rows of a chunk as plain Python values openpyxl can write (NaN -> empty)"""
+    values = chunk.astype(object)
+    return values.where(chunk.notna(), None).itertuples(index=False, name=None)
+
+def write_xlsx(sheets):
+    """
+    Write {sheet name: iterable of frame chunks} with a write-only workbook
+    Rows are streamed to the file as they come; sheets longer than Excel's
+    row limit continue on numbered sheets
+    """
+    workbook = Workbook(write_only=True)
+    for name, chunks in sheets.items():
+        sheet, rows, part = None, 0, 1
+        for chunk in chunks:
+            for row in _xlsx_values(chunk):
+                if sheet is None or rows == XLSX_MAX_ROWS:
+                    sheet = workbook.create_sheet(name if part == 1 else f"{name} {part}")
+                    sheet.append(list(chunk.columns))
+                    rows, part = 0, part + 1
+                sheet.append(row)
+                rows += 1
+        if sheet is None:
+            # Empty selection: keep the sheet, with no header to infer
+            workbook.create_sheet(name)
+    output = _spool()
+    workbook.save(output)
+    output.seek(0)
+    return output
+
+@fragment
+@instrumented
+def render_export_panel(selection, aggregates):
+    """
+    Download the current selection as CSV (one table) or Excel (every table)
+    selection: the page's SalesSelection; its rows are read chunk_rows at a time
+    Files are generated when the button is clicked, on Streamlit's download
+    thread, so the page rerun is not blocked. Streamlit holds the finished
+    file in memory until it is served. A fragment: picking a format or table
+    reruns only the panel
+    """
+    st.subheader("📥 Export")
+    tables = chart_tables(aggregates)
+
+    def selected_rows():
+        return selection.iter_rows(get_export_settings()['chunk_rows'])
+
+    col_format, col_data, col_button = st.columns([1, 2, 1])
+    with col_format:
+        file_format = st.selectbox("Format", list(EXPORT_FORMATS), key="export_format")
+    extension, mime = EXPORT_FORMATS[file_format]
+
+    if file_format == "CSV":
+        with col_data:
+            dataset = st.selectbox("Data", [TRANSACTIONS, *tables], key="export_dataset")
+        file_name = f"ventas_{dataset.lower().replace(' ', '_')}.{extension}"
+
+        def build_file():
+            return write_csv(selected_rows() if dataset == TRANSACTIONS else [tables[dataset]])
+    else:
+        with col_data:
+            st.caption(f"One sheet each: {TRANSACTIONS}, {', '.join(tables)}")
+        file_name = f"ventas.{extension}"
+
+        def build_file():
+            return write_xlsx({TRANSACTIONS: selected_rows(), **{name: [table] for name, table in tables.items()}})
+
+    with col_button:
+        st.download_button(
+            "⬇️ Download", data=build_file, file_name=file_name, mime=mime,
+            key="export_download", on_click="ignore"
+        )
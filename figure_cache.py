@@ -0,0 +1,45 @@
+import hashlib
+import json
+
+import pandas as pd
+import plotly.io as pio
+import streamlit as st
+
+from config import get_theme_colors, get_cache_settings
+from result_cache import ResultCache
+from instrumentation import stage
+
+def figure_key(builder, inputs):
+    """
+    Hash of a figure builder, its aggregated inputs and the theme colors
+    Frames are hashed by column names, dtypes and values (not index)
+    """
+    digest = hashlib.sha256(builder.__name__.encode("utf-8"))
+    digest.update(json.dumps(get_theme_colors(), sort_keys=True).encode("utf-8"))
+    for value in inputs:
+        if isinstance(value, pd.DataFrame):
+            digest.update(json.dumps([[str(c), str(t)] for c, t in value.dtypes.items()]).encode("utf-8"))
+            digest.update(pd.util.hash_pandas_object(value, index=False).to_numpy().tobytes())
+        else:
+            digest.update(json.dumps(value, default=str, sort_keys=True).encode("utf-8"))
+    return digest.hexdigest()
+
+def figure_bytes(figure):
+    """Size of a figure's serialized spec, what st.plotly_chart sends"""
+    return len(pio.to_json(figure, validate=False))
+
+@st.cache_resource
+def get_figure_cache():
+    """Process-wide cache of built Plotly figures shared by every session"""
+    settings = get_cache_settings()
+    return ResultCache(settings['figure_cache_entries'], settings['figure_cache_bytes'], sizeof=figure_bytes)
+
+def cached_figure(builder, *inputs):
+    """
+    Return builder(*inputs), reusing the figure built for identical inputs
+    Cached figures are shared: callers must not mutate them
+    """
+    def build():
+        with stage(builder.__name__):
+            return builder(*inputs)
+    return get_figure_cache().get_or_compute(None, figure_key(builder, inputs), build)
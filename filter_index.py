@@ -0,0 +1,173 @@
+import numpy as np
+import pandas as pd
+
+# Sidebar dimensions stored as categoricals and indexed at load time
+FILTER_DIMENSIONS = ["region", "categoria", "canal", "vendedor"]
+
+def encode_dimensions(df, dimensions=FILTER_DIMENSIONS):
+    """Store the filter dimensions as categorical codes"""
+    for dim in dimensions:
+        if not isinstance(df[dim].dtype, pd.CategoricalDtype):
+            df[dim] = df[dim].astype("category")
+    return df
+
+def build_dimension_dictionary(frame, row_counts, sales, dimensions=FILTER_DIMENSIONS):
+    """
+    Value dictionaries and co-occurrence counts of the filter dimensions
+    frame holds the dimension columns of rows, cube cells or distinct
+    combinations, with their row counts and sales. Each distinct combination
+    keeps its total rows and sales, so option lists and counts for any
+    selection are answered without touching the rows. Values keep their
+    order of first appearance.
+    """
+    values, codes = {}, []
+    for dim in dimensions:
+        dim_codes, uniques = pd.factorize(frame[dim])
+        values[dim] = pd.Index(np.asarray(uniques, dtype=object))
+        codes.append(dim_codes)
+    
+    codes = np.array(codes, dtype=np.int64).reshape(len(dimensions), -1)
+    # Rows with a missing dimension can never be selected
+    valid = (codes >= 0).all(axis=0)
+    combos, inverse = np.unique(codes[:, valid], axis=1, return_inverse=True)
+    inverse = inverse.ravel()
+    return {
+        'values': values,
+        'codes': dict(zip(dimensions, combos)),
+        'rows': np.bincount(inverse, weights=np.asarray(row_counts)[valid], minlength=combos.shape[1]).astype(np.int64),
+        'sales': np.bincount(inverse, weights=np.asarray(sales, dtype=np.float64)[valid], minlength=combos.shape[1])
+    }
+
+def dimension_options(dictionary, dim, selections):
+    """
+    Values of `dim` that have rows under the given selections
+    selections: {other dimension: selected values}. Returns a frame of
+    value, rows and sales in dictionary order.
+    """
+    keep = np.ones(len(dictionary['rows']), dtype=bool)
+    for other, selected in selections.items():
+        chosen = np.zeros(len(dictionary['values'][other]), dtype=bool)
+        positions = dictionary['values'][other].get_indexer(pd.Index(list(selected), dtype=object))
+        chosen[positions[positions >= 0]] = True
+        keep &= chosen[dictionary['codes'][other]]
+    
+    values = dictionary['values'][dim]
+    codes = dictionary['codes'][dim][keep]
+    rows = np.bincount(codes, weights=dictionary['rows'][keep], minlength=len(values))
+    sales = np.bincount(codes, weights=dictionary['sales'][keep], minlength=len(values))
+    present = rows > 0
+    return pd.DataFrame({
+        'value': values[present],
+        'rows': rows[present].astype(np.int64),
+        'sales': sales[present]
+    })
+
+def build_filter_index(df, dimensions=FILTER_DIMENSIONS):
+    """
+    Build a sorted row-id index for each categorical dimension
+    Row ids are grouped by category code (CSR layout): the rows holding
+    value i are row_ids[offsets[i]:offsets[i + 1]]
+    """
+    n_rows = len(df)
+    id_dtype = np.int32 if n_rows < np.iinfo(np.int32).max else np.int64
+    index = {'n_rows': n_rows, 'dimensions': {}}
+    
+    for dim in dimensions:
+        column = df[dim]
+        if not isinstance(column.dtype, pd.CategoricalDtype):
+            column = column.astype("category")
+        categories = column.cat.categories
+        # Shift codes by one so missing values (-1) get their own bucket 0
+        codes = column.cat.codes.to_numpy().astype(np.int64) + 1
+        counts = np.bincount(codes, minlength=len(categories) + 1)
+        index['dimensions'][dim] = {
+            'categories': categories,
+            'row_ids': np.argsort(codes, kind="stable").astype(id_dtype),
+            'offsets': np.concatenate(([0], np.cumsum(counts)))[1:],
+            'counts': counts[1:]
+        }
+    return index
+
+def _dimension_mask(entry, n_rows, selected_codes):
+    """Build the row mask of one dimension from the smaller side of the selection"""
+    row_ids, offsets, counts = entry['row_ids'], entry['offsets'], entry['counts']
+    selected = np.zeros(len(counts), dtype=bool)
+    selected[selected_codes] = True
+    
+    if counts[selected].sum() <= n_rows // 2:
+        mask = np.zeros(n_rows, dtype=bool)
+        codes, value = np.flatnonzero(selected), True
+    else:
+        # Mostly selected: start from all rows and clear the excluded ones
+        # (missing values are never selected)
+        mask = np.ones(n_rows, dtype=bool)
+        mask[row_ids[:offsets[0]]] = False
+        codes, value = np.flatnonzero(~selected), False
+    
+    for code in codes:
+        mask[row_ids[offsets[code]:offsets[code + 1]]] = value
+    return mask
+
+def select_rows(index, selections):
+    """
+    Resolve a {dimension: selected values} mapping to a boolean row mask
+    Dimensions with every value selected are skipped; returns None when
+    no dimension constrains the rows
+    """
+    n_rows = index['n_rows']
+    mask = None
+    
+    for dim, values in selections.items():
+        entry = index['dimensions'][dim]
+        codes = entry['categories'].get_indexer(pd.Index(values).unique())
+        codes = codes[codes >= 0]
+        if len(codes) == len(entry['categories']) and entry['offsets'][0] == 0:
+            continue
+        
+        dim_mask = _dimension_mask(entry, n_rows, codes)
+        mask = dim_mask if mask is None else (mask & dim_mask)
+        if not mask.any():
+            break
+    
+    return mask
+
+def extend_filter_index(index, new_rows):
+    """
+    Return a new index covering appended rows without re-sorting old ones
+    new_rows' categoricals must extend (not reorder) the indexed categories
+    """
+    n_old, n_new = index['n_rows'], len(new_rows)
+    n_rows = n_old + n_new
+    id_dtype = np.int32 if n_rows < np.iinfo(np.int32).max else np.int64
+    extended = {'n_rows': n_rows, 'dimensions': {}}
+    
+    for dim, entry in index['dimensions'].items():
+        categories = new_rows[dim].cat.categories
+        n_buckets = len(categories) + 1
+        old_counts = np.zeros(n_buckets, dtype=np.int64)
+        old_counts[0] = entry['offsets'][0]
+        old_counts[1:len(entry['counts']) + 1] = entry['counts']
+        
+        new_codes = new_rows[dim].cat.codes.to_numpy().astype(np.int64) + 1
+        new_counts = np.bincount(new_codes, minlength=n_buckets)
+        total_counts = old_counts + new_counts
+        starts = np.concatenate(([0], np.cumsum(total_counts)[:-1]))
+        
+        row_ids = np.empty(n_rows, dtype=id_dtype)
+        # Old ids keep their order, shifted by the new rows of earlier buckets
+        old_starts = np.concatenate(([0], np.cumsum(old_counts)[:-1]))
+        old_buckets = np.repeat(np.arange(n_buckets), old_counts)
+        row_ids[np.arange(n_old) + (starts - old_starts)[old_buckets]] = entry['row_ids']
+        # New ids go at the end of their bucket
+        order = np.argsort(new_codes, kind="stable")
+        sorted_codes = new_codes[order]
+        rank = np.arange(n_new) - np.concatenate(([0], np.cumsum(new_counts)[:-1]))[sorted_codes]
+        row_ids[starts[sorted_codes] + old_counts[sorted_codes] + rank] = order + n_old
+        
+        extended['dimensions'][dim] = {
+            'categories': categories,
+            'row_ids': row_ids,
+            'offsets': np.cumsum(total_counts),
+            'counts': total_counts[1:]
+        }
+    return extended
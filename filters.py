@@ -1,10 +1,67 @@
 import streamlit as st
 from config import get_app_info
+from filter_index import dimension_options
+from instrumentation import instrumented
 
-def render_sidebar(df):
+# Sidebar filters in cascade order
+FILTER_LABELS = {
+    'region': "🌎 Region",
+    'categoria': "📦 Category",
+    'canal': "🛒 Channel",
+    'vendedor': "👤 Salesperson"
+}
+
+def _cascading_multiselect(label, dim, options):
+    """
+    Multiselect over the options frame (value, rows, sales)
+    Choices survive option changes: values the user removed stay removed,
+    values that become reachable again start selected like the defaults
+    """
+    key, options_key = f"filter_{dim}", f"filter_{dim}_options"
+    values = options["value"].tolist()
+    previous = st.session_state.get(options_key)
+    if key not in st.session_state or previous is None:
+        selected = values
+    else:
+        current, previous = set(st.session_state[key]), set(previous)
+        selected = [value for value in values if value in current or value not in previous]
+    st.session_state[key] = selected
+    st.session_state[options_key] = values
+    
+    counts = dict(zip(values, zip(options["rows"], options["sales"])))
+    return st.multiselect(
+        label,
+        options=values,
+        key=key,
+        format_func=lambda value: f"{value} ({counts[value][0]:,} rows · ${counts[value][1]:,.0f})"
+    )
+
+def _date_range_input(date_bounds):
+    """
+    Date range picker over the data's first and last day
+    A range that covered the whole span keeps doing so when the data grows;
+    returns (start, end), or None when every day is selected
+    """
+    first, last = date_bounds
+    key, bounds_key = "filter_dates", "filter_dates_bounds"
+    picked = st.session_state.get(key)
+    if picked is None or tuple(picked) == st.session_state.get(bounds_key):
+        picked = (first, last)
+    st.session_state[key] = tuple(min(max(day, first), last) for day in picked)
+    st.session_state[bounds_key] = (first, last)
+    
+    picked = st.date_input("📅 Date range", min_value=first, max_value=last, key=key)
+    # While a range is being picked only its start is set
+    start, end = (picked[0], picked[-1]) if len(picked) == 2 else (picked[0] if picked else first, last)
+    return None if (start, end) == (first, last) else (start, end)
+
+@instrumented
+def render_sidebar(dimensions, date_bounds=None):
     """
     Render sidebar with logo, title and interactive filters
-    Returns selected filters
+    dimensions: dimension dictionary built at load time (no row scans)
+    date_bounds: (first, last) day of the data; no date filter without it
+    Returns selected filters and the date range (None = all days)
     """
     app_info = get_app_info()
     
@@ -20,27 +77,14 @@ def render_sidebar(df):
         
         st.title("Filters")
         
-        # Interactive filters
-        regions = st.multiselect(
-            "🌎 Region",
-            options=df["region"].unique(),
-            default=df["region"].unique()
-        )
-        categories = st.multiselect(
-            "📦 Category",
-            options=df["categoria"].unique(),
-            default=df["categoria"].unique()
-        )
-        channels = st.multiselect(
-            "🛒 Channel",
-            options=df["canal"].unique(),
-            default=df["canal"].unique()
-        )
-        salespeople = st.multiselect(
-            "👤 Salesperson",
-            options=df["vendedor"].unique(),
-            default=df["vendedor"].unique()
-        )
+        # Cascading filters: each one lists only the values with rows under
+        # the selections above it
+        selections = {}
+        for dim, label in FILTER_LABELS.items():
+            options = dimension_options(dimensions, dim, selections)
+            selections[dim] = _cascading_multiselect(label, dim, options)
+        regions, categories, channels, salespeople = selections.values()
+        date_range = _date_range_input(date_bounds) if date_bounds else None
         
         # Filter summary
         st.markdown("---")
@@ -49,5 +93,7 @@ def render_sidebar(df):
         st.markdown(f"- Categories: {len(categories)} selected")
         st.markdown(f"- Channels: {len(channels)} selected")
         st.markdown(f"- Salespeople: {len(salespeople)} selected")
+        if date_range:
+            st.markdown(f"- Dates: {date_range[0]:%Y-%m-%d} to {date_range[1]:%Y-%m-%d}")
         
-        return regions, categories, channels, salespeople
+        return regions, categories, channels, salespeople, date_range
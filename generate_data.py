@@ -0,0 +1,114 @@
+"""
+Synthetic sales data generator
+Writes CSVs with the ventas_data.csv schema at any size, e.g.:
+
+    python generate_data.py --rows 1000000 --output ventas_1m.csv
+"""
+import argparse
+
+import numpy as np
+import pandas as pd
+
+# Same schema (and column order) as ventas_data.csv
+SALES_COLUMNS = [
+    "fecha", "vendedor", "region", "producto", "categoria", "unidades",
+    "precio_unitario", "ventas_total", "costo_total", "meta_mensual", "cliente", "canal"
+]
+REGIONS = ["Norte", "Sur", "Centro", "Este", "Oeste"]
+CATEGORIES = ["Tecnología", "Accesorios", "Almacenamiento", "Redes"]
+CHANNELS = ["Online", "Tienda"]
+MONTHLY_TARGETS = [30000, 40000, 50000]
+# Customer popularity follows a Zipf law bounded to the customer list
+CUSTOMER_ZIPF_EXPONENT = 1.0
+
+def build_catalog(n_vendors, n_products, n_customers, seed=0):
+    """Build the vendor, product and customer dimensions"""
+    rng = np.random.default_rng(seed)
+    vendors = pd.DataFrame({
+        'vendedor': [f"Vendedor {i:04d}" for i in range(n_vendors)],
+        'region': [REGIONS[i % len(REGIONS)] for i in range(n_vendors)],
+        'meta_mensual': rng.choice(MONTHLY_TARGETS, n_vendors)
+    })
+    products = pd.DataFrame({
+        'producto': [f"Producto {i:05d}" for i in range(n_products)],
+        'categoria': [CATEGORIES[i % len(CATEGORIES)] for i in range(n_products)],
+        'precio_unitario': rng.integers(9, 1500, n_products),
+        'costo_ratio': rng.choice([0.5, 0.6], n_products)
+    })
+    customers = np.array([f"Cliente {i:07d}" for i in range(n_customers)], dtype=object)
+    return vendors, products, customers
+
+def generate_chunk(rng, n_rows, start_date, n_days, vendors, products, customers):
+    """Generate n_rows random transactions, sorted by date"""
+    vendor_ids = rng.integers(0, len(vendors), n_rows)
+    product_ids = rng.integers(0, len(products), n_rows)
+    # Skewed customer popularity, like real order books; drawn from the
+    # bounded distribution so every customer can appear and none collects the tail
+    weights = 1 / np.arange(1, len(customers) + 1) ** CUSTOMER_ZIPF_EXPONENT
+    customer_ids = rng.choice(len(customers), n_rows, p=weights / weights.sum())
+    days = np.sort(rng.integers(0, n_days, n_rows))
+    units = rng.integers(1, 30, n_rows)
+
+    price = products["precio_unitario"].to_numpy()[product_ids]
+    sales = units * price
+    return pd.DataFrame({
+        'fecha': (pd.Timestamp(start_date) + pd.to_timedelta(days, unit="D")).strftime("%Y-%m-%d"),
+        'vendedor': vendors["vendedor"].to_numpy()[vendor_ids],
+        'region': vendors["region"].to_numpy()[vendor_ids],
+        'producto': products["producto"].to_numpy()[product_ids],
+        'categoria': products["categoria"].to_numpy()[product_ids],
+        'unidades': units,
+        'precio_unitario': price,
+        'ventas_total': sales,
+        'costo_total': (sales * products["costo_ratio"].to_numpy()[product_ids]).round(2),
+        'meta_mensual': vendors["meta_mensual"].to_numpy()[vendor_ids],
+        'cliente': customers[customer_ids],
+        'canal': np.array(CHANNELS)[rng.integers(0, len(CHANNELS), n_rows)]
+    })[SALES_COLUMNS]
+
+def generate_sales_csv(output, rows, vendors=50, products=200, customers=5000,
+                       months=12, start_date="2024-01-01", seed=0, chunk_rows=500_000):
+    """
+    Write a synthetic sales CSV in date order, chunk by chunk
+    Memory stays bounded by chunk_rows regardless of the total row count
+    """
+    rng = np.random.default_rng(seed)
+    vendor_dim, product_dim, customer_dim = build_catalog(vendors, products, customers, seed)
+    start = pd.Timestamp(start_date)
+    n_days = (start + pd.DateOffset(months=months) - start).days
+
+    written = 0
+    n_chunks = max(-(-rows // chunk_rows), 1)
+    for chunk_index in range(n_chunks):
+        n_rows = min(chunk_rows, rows - written)
+        # Each chunk covers its own slice of the period so the file stays sorted
+        day_from = n_days * chunk_index // n_chunks
+        day_to = max(n_days * (chunk_index + 1) // n_chunks, day_from + 1)
+        chunk = generate_chunk(
+            rng, n_rows, start + pd.Timedelta(days=day_from), day_to - day_from,
+            vendor_dim, product_dim, customer_dim
+        )
+        chunk.to_csv(output, mode="w" if chunk_index == 0 else "a", header=chunk_index == 0, index=False)
+        written += n_rows
+    return written
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic sales CSV")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--vendors", type=int, default=50)
+    parser.add_argument("--products", type=int, default=200)
+    parser.add_argument("--customers", type=int, default=5000)
+    parser.add_argument("--months", type=int, default=12)
+    parser.add_argument("--start-date", default="2024-01-01")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="ventas_synthetic.csv")
+    args = parser.parse_args()
+
+    written = generate_sales_csv(
+        args.output, args.rows, args.vendors, args.products, args.customers,
+        args.months, args.start_date, args.seed
+    )
+    print(f"Wrote {written:,} rows to {args.output}")
+
+if __name__ == "__main__":
+    main()
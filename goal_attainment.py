@@ -0,0 +1,52 @@
+# Per salesperson-month sales and target; monthly targets are taken once
+# per salesperson-month (max of the repeated meta_mensual), not per row
+GOAL_AGGREGATIONS = {
+    'salesperson_months': {
+        'by': ["vendedor", "mes"],
+        'measures': ["ventas_total"],
+        'max_measures': ["meta_mensual_max"]
+    }
+}
+
+GOAL_SORT_COLUMNS = {
+    'Achievement': "achievement_%",
+    'Sales': "sales",
+    'Target': "target",
+    'Salesperson': "vendedor"
+}
+
+def goal_attainment(salesperson_months):
+    """
+    Target, sales and achievement for every salesperson in one grouped pass
+    Returns a frame ranked by achievement (rank 1 = best)
+    """
+    table = salesperson_months.groupby("vendedor", observed=True).agg(
+        target=("meta_mensual_max", "sum"),
+        sales=("ventas_total", "sum"),
+        months=("mes", "count")
+    ).reset_index()
+    table["achievement_%"] = (table["sales"] / table["target"] * 100).where(table["target"] > 0, 0.0)
+    table["rank"] = table["achievement_%"].rank(method="min", ascending=False).astype(int)
+    return table.sort_values(["rank", "vendedor"], ignore_index=True)
+
+def goal_totals(attainment):
+    """Team target, sales and achievement from a goal_attainment() table"""
+    target = attainment["target"].sum()
+    sales = attainment["sales"].sum()
+    return {
+        'meta_mensual': target,
+        'ventas_total': sales,
+        'achievement_%': (sales / target * 100) if target > 0 else 0
+    }
+
+def top_n(attainment, n, column="achievement_%"):
+    """Best n salespeople by a column (partial selection, no full sort)"""
+    return attainment.nlargest(n, column)
+
+def worst_n(attainment, n, column="achievement_%"):
+    """Worst n salespeople by a column (partial selection, no full sort)"""
+    return attainment.nsmallest(n, column)
+
+def sort_attainment(attainment, column, ascending=False):
+    """Sort the attainment table by any of its columns"""
+    return attainment.sort_values(column, ascending=ascending, ignore_index=True)
@@ -0,0 +1,182 @@
+import hashlib
+import os
+import threading
+import time
+
+import pandas as pd
+import streamlit as st
+
+from config import get_data_settings
+from data_loader import derive_sales_columns, read_csv_range, read_sales_data
+from filter_index import FILTER_DIMENSIONS, build_filter_index, extend_filter_index
+from sales_cube import build_sales_cube, merge_cubes, union_categories, cube_dimension_dictionary
+from distinct_sketch import build_customer_sketches, merge_sketches
+from sales_trend import build_time_index, extend_time_index
+from parallel_engine import parallel_workers
+
+# Bytes hashed at the start of the file and just before the loaded offset
+# to detect a rewritten (rather than appended) file without reading it all
+GUARD_BYTES = 4096
+
+def _guard_digests(path, offset):
+    """Hash the head of the file and the bytes just before `offset`"""
+    with open(path, "rb") as handle:
+        head = handle.read(min(GUARD_BYTES, offset))
+        handle.seek(max(offset - GUARD_BYTES, 0))
+        tail = handle.read(min(GUARD_BYTES, offset))
+    return hashlib.sha256(head).hexdigest(), hashlib.sha256(tail).hexdigest()
+
+def _last_line_end(path, start, end):
+    """Offset just past the last newline in [start, end), or start if none"""
+    position = end
+    with open(path, "rb") as handle:
+        while position > start:
+            block_start = max(position - 65536, start)
+            handle.seek(block_start)
+            block = handle.read(position - block_start)
+            newline = block.rfind(b"\n")
+            if newline >= 0:
+                return block_start + newline + 1
+            position = block_start
+    return start
+
+def _publish(state, frame, filter_index, time_index, cube, sketches, offset, mtime_ns, mode, rows_added, start):
+    """Build the next immutable dataset state"""
+    head_digest, tail_digest = _guard_digests(state['csv_path'], offset)
+    version = state.get('version', 0) + 1
+    frame.attrs["load_info"] = {
+        **frame.attrs.get("load_info", {}),
+        'snapshot': state.get('snapshot', "n/a"),
+        'ingest': mode,
+        'rows_added': rows_added,
+        'version': version,
+        # Bumped on every publish, so shared results never outlive a rebuild
+        'data_version': f"v{version}-{offset}-{mtime_ns}",
+        'rows': len(frame),
+        'size': offset,
+        'mtime_ns': mtime_ns,
+        'seconds': round(time.perf_counter() - start, 3),
+        'loaded_at': time.strftime("%Y-%m-%d %H:%M:%S")
+    }
+    return {
+        'csv_path': state['csv_path'],
+        'snapshot': state.get('snapshot', "n/a"),
+        'columns': state['columns'],
+        'version': version,
+        'frame': frame,
+        'filter_index': filter_index,
+        'time_index': time_index,
+        'cube': {'frame': cube, 'index': build_filter_index(cube)},
+        'dimensions': cube_dimension_dictionary(cube),
+        'customer_sketches': sketches,
+        'offset': offset,
+        'mtime_ns': mtime_ns,
+        'rows': len(frame),
+        'head_digest': head_digest,
+        'tail_digest': tail_digest,
+        # A final line without a newline may still be growing: any append
+        # after it must go through a full rebuild
+        'ends_with_newline': _last_line_end(state['csv_path'], max(offset - 1, 0), offset) == offset
+    }
+
+def full_ingest(csv_path=None, version=0):
+    """
+    Load the whole CSV (via the snapshot when fresh) and index it
+    `version` is the state being replaced, so versions keep increasing
+    across rebuilds
+    """
+    start = time.perf_counter()
+    csv_path = csv_path or get_data_settings()['csv_path']
+    # Appended rows are merged column by column: keep the standard layout
+    frame = read_sales_data(csv_path, compact=False)
+    load_info = frame.attrs["load_info"]
+    state = {
+        'csv_path': csv_path,
+        'snapshot': load_info['snapshot'],
+        'version': version,
+        'columns': list(pd.read_csv(csv_path, nrows=0).columns)
+    }
+    settings = get_data_settings()
+    sketches = None
+    if settings['distinct_customers'] == "sketch":
+        sketches = build_customer_sketches(frame, settings['sketch_precision'])
+    return _publish(
+        state, frame, build_filter_index(frame), build_time_index(frame),
+        build_sales_cube(frame, parallel_workers(len(frame))), sketches,
+        load_info['size'], load_info['mtime_ns'], "full", len(frame), start
+    )
+
+def _append_rows(state, new_rows, offset, mtime_ns, start):
+    """Merge parsed tail rows into the frame, filter and time indexes and cube"""
+    old_frame = state['frame']
+    sketches = state['customer_sketches']
+    if sketches is not None:
+        # Sketches are mergeable: only the tail is hashed
+        sketches = merge_sketches(sketches, build_customer_sketches(new_rows, sketches['precision']))
+    # Extend dictionaries (old codes keep their meaning) before concatenating
+    extended = {}
+    for dim in FILTER_DIMENSIONS:
+        categories = union_categories(old_frame[dim], new_rows[dim])
+        extended[dim] = old_frame[dim].cat.set_categories(categories)
+        new_rows[dim] = new_rows[dim].cat.set_categories(categories)
+    new_rows.index = pd.RangeIndex(len(old_frame), len(old_frame) + len(new_rows))
+    frame = pd.concat([old_frame.assign(**extended), new_rows])
+    
+    return _publish(
+        state, frame,
+        extend_filter_index(state['filter_index'], new_rows),
+        extend_time_index(state['time_index'], new_rows),
+        merge_cubes(state['cube']['frame'], build_sales_cube(new_rows)),
+        sketches,
+        offset, mtime_ns, "append", len(new_rows), start
+    )
+
+def refresh_ingest(state):
+    """
+    Bring a dataset state up to date with the CSV
+    Appended complete lines are parsed on their own and merged in; a
+    truncated or rewritten file, or a change that appended no complete
+    line, triggers a full rebuild. Returns the same state object when the
+    size and mtime are unchanged.
+    """
+    if state is None:
+        return full_ingest()
+    
+    start = time.perf_counter()
+    csv_path, offset = state['csv_path'], state['offset']
+    stat = os.stat(csv_path)
+    if stat.st_size == offset and stat.st_mtime_ns == state['mtime_ns']:
+        return state
+    if stat.st_size < offset or not state['ends_with_newline']:
+        return full_ingest(csv_path, state['version'])
+    if _guard_digests(csv_path, offset) != (state['head_digest'], state['tail_digest']):
+        return full_ingest(csv_path, state['version'])
+    
+    end = _last_line_end(csv_path, offset, stat.st_size)
+    if end == offset:
+        # Same-size edits between the guard windows land here too
+        return full_ingest(csv_path, state['version'])
+    new_rows = derive_sales_columns(read_csv_range(csv_path, offset, end, names=state['columns']))
+    return _append_rows(state, new_rows, end, stat.st_mtime_ns, start)
+
+class IncrementalSalesData:
+    """Process-wide holder that serializes refreshes of the ingest state"""
+    
+    def __init__(self, csv_path=None):
+        self._csv_path = csv_path
+        self._lock = threading.Lock()
+        self._state = None
+    
+    def refresh(self):
+        """Ingest any appended rows and return the current state"""
+        with self._lock:
+            if self._state is None:
+                self._state = full_ingest(self._csv_path)
+            else:
+                self._state = refresh_ingest(self._state)
+            return self._state
+
+@st.cache_resource
+def get_incremental_sales_data():
+    """Shared incremental dataset for every session of this process"""
+    return IncrementalSalesData()
@@ -0,0 +1,277 @@
+"""
+Per-rerun stage instrumentation
+Records wall time, rows in/out and memory deltas for every pipeline stage,
+emits one JSON log line per stage and feeds the sidebar debug panel.
+Fragment reruns (a widget inside an st.fragment section) are profiled on
+their own. Summarize a log into per-stage latency percentiles with:
+
+    python instrumentation.py perf.log
+"""
+import functools
+import json
+import logging
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from contextlib import contextmanager
+
+import pandas as pd
+import streamlit as st
+
+from config import get_instrumentation_settings
+from compact_storage import memory_report
+
+PERF_LOGGER = "sales_analytics.perf"
+
+# The profiler of the rerun running on this thread (Streamlit reruns each
+# session's script on its own thread)
+_current = threading.local()
+
+# ─── MEMORY PROBES ────────────────────────────────────────────
+try:
+    import resource
+    _PAGE_SIZE = resource.getpagesize()
+except ImportError:
+    _PAGE_SIZE = 4096
+
+def rss_bytes():
+    """Current resident set size of the process, or None when unavailable"""
+    try:
+        with open("/proc/self/statm", "rb") as handle:
+            return int(handle.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return None
+
+def _rows(value):
+    """Row count of a frame-like value, None for anything else"""
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return len(value)
+    return None
+
+# ─── JSON LOG LINES ───────────────────────────────────────────
+def get_perf_logger():
+    """Logger that writes one JSON object per line"""
+    logger = logging.getLogger(PERF_LOGGER)
+    if not logger.handlers:
+        settings = get_instrumentation_settings()
+        if settings['log_path']:
+            handler = logging.FileHandler(settings['log_path'], encoding="utf-8")
+        else:
+            handler = logging.StreamHandler(sys.stderr)
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+    return logger
+
+# ─── PROFILER ─────────────────────────────────────────────────
+class RerunProfiler:
+    """
+    Stage records for a single script rerun
+    scope: "script" for a full rerun, else the name of the fragment that reran
+    """
+
+    def __init__(self, session_id=None, trace_allocations=False, scope="script"):
+        self.run_id = uuid.uuid4().hex[:12]
+        self.session_id = session_id
+        self.scope = scope
+        self.trace_allocations = trace_allocations
+        self.records = []
+        self._depth = 0
+        self._start = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name, rows_in=None):
+        """
+        Time the enclosed block as one stage
+        Yields the record so the block can set rows_out or extra fields
+        """
+        record = {'stage': name, 'depth': self._depth, 'rows_in': rows_in, 'rows_out': None}
+        # Appended up front so nested stages list after their parent
+        self.records.append(record)
+        tracing = self.trace_allocations and tracemalloc.is_tracing()
+        if tracing:
+            allocated_before = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        rss_before = rss_bytes()
+        self._depth += 1
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record['seconds'] = time.perf_counter() - start
+            self._depth -= 1
+            rss_after = rss_bytes()
+            record['rss_delta_mb'] = (
+                (rss_after - rss_before) / 1e6 if rss_before is not None and rss_after is not None else None
+            )
+            if tracing:
+                allocated, peak = tracemalloc.get_traced_memory()
+                record['allocated_delta_mb'] = (allocated - allocated_before) / 1e6
+                record['peak_mb'] = (peak - allocated_before) / 1e6
+
+    def total_seconds(self):
+        """Wall time since the rerun started"""
+        return time.perf_counter() - self._start
+
+    def frame(self):
+        """Stage records as a DataFrame, in start order"""
+        return pd.DataFrame(self.records)
+
+    def emit(self):
+        """Write one JSON line per stage plus a rerun summary line"""
+        logger = get_perf_logger()
+        timestamp = time.strftime("%Y-%m-%dT%H:%M:%S")
+        for record in self.records:
+            logger.info(json.dumps({
+                'event': "stage", 'ts': timestamp, 'run_id': self.run_id,
+                'session_id': self.session_id, **record
+            }, default=str))
+        logger.info(json.dumps({
+            'event': "rerun", 'ts': timestamp, 'run_id': self.run_id,
+            'session_id': self.session_id, 'scope': self.scope, 'seconds': self.total_seconds(),
+            'rss_mb': (rss_bytes() or 0) / 1e6
+        }))
+
+def _session_id():
+    """Streamlit session of the current thread, if any"""
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+        ctx = get_script_run_ctx(suppress_warning=True)
+    except ImportError:
+        return None
+    return ctx.session_id if ctx is not None else None
+
+def start_rerun(scope="script"):
+    """Begin profiling this rerun; returns None when instrumentation is off"""
+    settings = get_instrumentation_settings()
+    if not settings['enabled']:
+        _current.profiler = None
+        return None
+    if settings['trace_allocations'] and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    _current.profiler = RerunProfiler(_session_id(), settings['trace_allocations'], scope)
+    return _current.profiler
+
+def finish_rerun():
+    """
+    Emit the rerun's log lines and detach the profiler from this thread
+    Lines are emitted when json_log is on, or when a harness (load_test.py)
+    has attached its own handler to the perf logger
+    """
+    profiler = getattr(_current, "profiler", None)
+    _current.profiler = None
+    if profiler is not None and (
+        get_instrumentation_settings()['json_log'] or logging.getLogger(PERF_LOGGER).handlers
+    ):
+        profiler.emit()
+    return profiler
+
+@contextmanager
+def stage(name, rows_in=None):
+    """Record a stage on this rerun's profiler (no-op outside a profiled rerun)"""
+    profiler = getattr(_current, "profiler", None)
+    if profiler is None:
+        yield {}
+        return
+    with profiler.stage(name, rows_in) as record:
+        yield record
+
+def instrumented(func):
+    """Decorator: record every call as a stage named after the function"""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with stage(func.__name__, _rows(args[0]) if args else None):
+            return func(*args, **kwargs)
+    return wrapper
+
+def fragment(func):
+    """
+    Decorator: st.fragment whose partial reruns are profiled on their own
+    In a full rerun the section runs inline and records into that rerun's
+    profiler; when one of its widgets reruns only the fragment, the run gets
+    a profiler of its own with the fragment's name as scope
+    """
+    @functools.wraps(func)
+    def run(*args, **kwargs):
+        if getattr(_current, "profiler", None) is not None or not get_instrumentation_settings()['enabled']:
+            return func(*args, **kwargs)
+        start_rerun(scope=func.__name__)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            finish_rerun()
+    return st.fragment(run)
+
+# ─── DEBUG PANEL ──────────────────────────────────────────────
+def render_debug_panel(profiler, frame=None):
+    """Opt-in sidebar panel with this rerun's stage timings (and the frame's memory per column)"""
+    if profiler is None or not get_instrumentation_settings()['debug_panel']:
+        return
+    with st.sidebar:
+        st.markdown("---")
+        if not st.checkbox("🛠️ Performance debug", key="perf_debug_panel"):
+            return
+        table = profiler.frame()
+        if table.empty:
+            return
+        table["stage"] = ["  " * depth + name for depth, name in zip(table["depth"], table["stage"])]
+        table["ms"] = table["seconds"] * 1000
+        columns = ["stage", "ms", "rows_in", "rows_out", "rss_delta_mb"]
+        if "peak_mb" in table:
+            columns.append("peak_mb")
+        st.dataframe(
+            table[columns], hide_index=True, use_container_width=True,
+            column_config={
+                'ms': st.column_config.NumberColumn("ms", format="%.1f"),
+                'rss_delta_mb': st.column_config.NumberColumn("RSS Δ MB", format="%.1f"),
+                'peak_mb': st.column_config.NumberColumn("Peak MB", format="%.1f")
+            }
+        )
+        measured = table.loc[table["depth"] == 0, "seconds"].sum()
+        st.caption(
+            f"Rerun {profiler.run_id}: {profiler.total_seconds() * 1000:,.0f} ms total, "
+            f"{measured * 1000:,.0f} ms in measured stages"
+        )
+        if frame is not None:
+            report = memory_report(frame)
+            st.dataframe(
+                report[["column", "dtype", "bytes_per_row", "share_%"]], hide_index=True, use_container_width=True,
+                column_config={'bytes_per_row': st.column_config.NumberColumn("B/row", format="%.1f")}
+            )
+            compact = frame.attrs.get("load_info", {}).get("compact", False)
+            st.caption(
+                f"Dataset: {report['bytes'].sum() / 2**20:,.1f} MB for {len(frame):,} rows "
+                f"({'compact' if compact else 'standard'} storage)"
+            )
+
+# ─── LOG SUMMARY ──────────────────────────────────────────────
+def summarize_log(path, percentiles=(50, 95, 99)):
+    """Per-stage latency percentiles (ms) from a file of JSON log lines"""
+    rows = []
+    with open(path, encoding="utf-8") as handle:
+        for line in handle:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if entry.get("event") == "stage":
+                rows.append({'stage': entry["stage"], 'ms': entry["seconds"] * 1000})
+            elif entry.get("event") == "rerun":
+                scope = entry.get("scope", "script")
+                label = "(rerun)" if scope == "script" else f"(fragment {scope})"
+                rows.append({'stage': label, 'ms': entry["seconds"] * 1000})
+    if not rows:
+        return pd.DataFrame()
+    grouped = pd.DataFrame(rows).groupby("stage")["ms"]
+    summary = grouped.quantile([p / 100 for p in percentiles]).unstack()
+    summary.columns = [f"p{p}" for p in percentiles]
+    summary.insert(0, "count", grouped.count())
+    return summary.sort_values(f"p{percentiles[-1]}", ascending=False)
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        sys.exit("usage: python instrumentation.py <perf.log>")
+    print(summarize_log(sys.argv[1]).round(2).to_string())
@@ -1,40 +1,91 @@
+import pandas as pd
 import streamlit as st
 from config import get_theme_colors
+from instrumentation import instrumented, fragment
+from aggregation_plan import per_row_mean
+from sales_trend import PERIOD_SHIFTS, compare_periods
 
-def render_main_kpis(kpis):
+COMPARISON_LABELS = {
+    'MoM': "Previous month (MoM)",
+    'YoY': "Same month last year (YoY)"
+}
+
+def _month_label(month):
+    """'Mon YYYY' of a month number (months since 1970-01)"""
+    return pd.Period(year=1970 + month // 12, month=month % 12 + 1, freq="M").strftime("%b %Y")
+
+def period_deltas(month_prefix, month, comparison):
+    """
+    st.metric deltas of a month against the month PERIOD_SHIFTS[comparison] earlier
+    Both periods are O(1) lookups in the monthly prefix sums; a KPI gets
+    None when either period has no data. Margin changes are in points.
+    """
+    current, previous = compare_periods(month_prefix, month, PERIOD_SHIFTS[comparison])
+    deltas = dict.fromkeys(["total_sales", "total_profit", "avg_margin", "total_units"])
+    if current is None or previous is None:
+        return deltas
+    for kpi, column in (("total_sales", "ventas_total"), ("total_profit", "ganancia"), ("total_units", "unidades")):
+        if previous[column]:
+            deltas[kpi] = f"{(current[column] - previous[column]) / abs(previous[column]) * 100:+.1f}% {comparison}"
+    margins = per_row_mean(current, "margen_%"), per_row_mean(previous, "margen_%")
+    if not any(pd.isna(margin) for margin in margins):
+        deltas["avg_margin"] = f"{margins[0] - margins[1]:+.1f} pp {comparison}"
+    return deltas
+
+@fragment
+@instrumented
+def render_main_kpis(kpis, month_prefix=None, month=None):
     """
     Render the 5 main KPIs in the header
+    With the monthly prefix sums of the selection (sales_trend.build_month_prefix),
+    sales, profit, margin and units show their MoM/YoY change for `month`
+    (month number, default the last month with data). A fragment: switching
+    MoM/YoY reruns only this section
     """
     colors = get_theme_colors()
     
+    deltas = {}
+    if month_prefix is not None and month_prefix['months']:
+        comparison = st.radio(
+            "Compare with", list(PERIOD_SHIFTS), horizontal=True, key="kpi_comparison",
+            format_func=COMPARISON_LABELS.get
+        )
+        if month is None:
+            month = month_prefix['first'] + month_prefix['months'] - 1
+        deltas = period_deltas(month_prefix, month, comparison)
+        st.caption(
+            f"Changes compare {_month_label(month)} with {_month_label(month - PERIOD_SHIFTS[comparison])} "
+            f"for the selected regions, categories, channels and salespeople"
+        )
+    
     k1, k2, k3, k4, k5 = st.columns(5)
     
     with k1:
         st.metric(
             "💰 Total Sales", 
             f"${kpis['total_sales']:,.0f}",
-            delta=None
+            delta=deltas.get('total_sales')
         )
     
     with k2:
         st.metric(
             "📈 Total Profit", 
             f"${kpis['total_profit']:,.0f}",
-            delta=None
+            delta=deltas.get('total_profit')
         )
     
     with k3:
         st.metric(
             "🎯 Avg Margin", 
             f"{kpis['avg_margin']:.1f}%",
-            delta=None
+            delta=deltas.get('avg_margin')
         )
     
     with k4:
         st.metric(
             "📦 Units Sold", 
             f"{kpis['total_units']:,}",
-            delta=None
+            delta=deltas.get('total_units')
         )
     
     with k5:
@@ -44,12 +95,14 @@ def render_main_kpis(kpis):
             delta=None
         )
 
-def render_goal_kpis(df):
+def render_goal_kpis(goal_totals):
     """
     Render additional KPIs related to goals
+    goal_totals: team 'meta_mensual' target (each monthly target counted once
+    per salesperson-month) and summed 'ventas_total' for the selection
     """
-    total_target = df["meta_mensual"].sum()
-    total_sales = df["ventas_total"].sum()
+    total_target = goal_totals["meta_mensual"]
+    total_sales = goal_totals["ventas_total"]
     achievement_rate = (total_sales / total_target * 100) if total_target > 0 else 0
     
     st.metric("📊 Total Target", f"${total_target:,.0f}")
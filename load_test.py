@@ -0,0 +1,291 @@
+"""
+Concurrent-session load test
+Drives main.py headlessly with N simulated analysts in one process, each
+applying randomized sidebar filter selections, and reports throughput,
+rerun latency percentiles and process memory. Runs fully offline:
+
+    python load_test.py --rows 500000 --sessions 1,2,4,8 --interactions 20
+    python load_test.py --csv ventas_data.csv --sessions 16 --think 0.5 --output load_16.json
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import resource
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from unittest.mock import MagicMock
+
+import numpy as np
+from streamlit import config as streamlit_config
+from streamlit.components.v2.component_manager import BidiComponentManager
+from streamlit.logger import set_log_level
+from streamlit.runtime import Runtime
+from streamlit.runtime.caching.storage.dummy_cache_storage import MemoryCacheStorageManager
+from streamlit.runtime.dataframe_source_manager import DataframeSourceManager
+from streamlit.runtime.media_file_manager import MediaFileManager
+from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage
+from streamlit.runtime.pages_manager import PagesManager
+from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+from streamlit.testing.v1 import AppTest
+from streamlit.testing.v1.local_script_runner import LocalScriptRunner
+
+from config import get_app_info
+from filters import FILTER_LABELS
+from instrumentation import PERF_LOGGER, rss_bytes
+from generate_data import generate_sales_csv
+
+APP_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py")
+
+# ─── HEADLESS SESSIONS ───────────────────────────────────────
+def install_shared_runtime():
+    """
+    One mocked runtime for every simulated session
+    AppTest installs and removes a runtime around each run, so runs on
+    different threads would tear it down under each other
+    """
+    runtime = MagicMock(spec=Runtime)
+    runtime.media_file_mgr = MediaFileManager(MemoryMediaFileStorage("/mock/media"))
+    runtime.dataframe_source_mgr = DataframeSourceManager()
+    runtime.cache_storage_manager = MemoryCacheStorageManager()
+    components = BidiComponentManager()
+    components.discover_and_register_components(start_file_watching=False)
+    runtime.bidi_component_registry = components
+    Runtime._instance = runtime
+    # Like a server, compile the script once for every session
+    LoadSession.script_cache = ScriptCache()
+    PagesManager.uses_pages_directory = None
+    streamlit_config.set_option("global.appTest", True)
+    # Deprecation notices from every simulated rerun would drown the report
+    streamlit_config.set_option("logger.level", "error")
+    set_log_level("error")
+
+class LoadSession(AppTest):
+    """An AppTest session whose reruns may overlap with other sessions'"""
+    script_cache = None
+
+    def _run(self, widget_state=None, timeout=None):
+        pages_manager = PagesManager(self._script_path, self.script_cache, setup_watcher=False)
+        runner = LocalScriptRunner(
+            self._script_path, self._session_state, pages_manager,
+            fragment_storage=self._fragment_storage
+        )
+        self._tree = runner.run(
+            widget_state, self.query_params,
+            self.default_timeout if timeout is None else timeout, self._page_hash
+        )
+        self._tree._runner = self
+        return self
+
+class RerunLog(logging.Handler):
+    """Collects the app's per-rerun JSON log lines instead of printing them"""
+
+    def __init__(self):
+        super().__init__()
+        self.reruns = []
+
+    def emit(self, record):
+        entry = json.loads(record.getMessage())
+        if entry.get("event") == "rerun":
+            self.reruns.append(entry)
+
+# ─── SIMULATED ANALYSTS ──────────────────────────────────────
+def random_interaction(session, rng):
+    """
+    Change one sidebar filter the way an analyst would
+    A random non-empty subset of a filter's current options, now and then
+    all of them again; or a random date range, now and then the full span
+    """
+    state = session.session_state
+    targets = [dim for dim in FILTER_LABELS if state[f"filter_{dim}_options"]]
+    if "filter_dates_bounds" in state:
+        targets.append("dates")
+    target = rng.choice(targets)
+    if target == "dates":
+        first, last = state["filter_dates_bounds"]
+        days = (last - first).days
+        if rng.random() < 0.2 or days == 0:
+            picked = (first, last)
+        else:
+            start, end = sorted(rng.sample(range(days + 1), 2))
+            picked = (first + timedelta(days=start), first + timedelta(days=end))
+        session.date_input(key="filter_dates").set_value(picked)
+        return target
+    options = list(state[f"filter_{target}_options"])
+    if rng.random() < 0.2:
+        picked = options
+    else:
+        picked = rng.sample(options, rng.randint(1, len(options)))
+    session.multiselect(key=f"filter_{target}").set_value(picked)
+    return target
+
+def run_session(session, rng, interactions, think, start_gate, samples, errors):
+    """Open the dashboard, then apply `interactions` filter changes"""
+    start_gate.wait()
+    for step in range(interactions + 1):
+        action = "open" if step == 0 else random_interaction(session, rng)
+        start = time.perf_counter()
+        session.run()
+        samples.append({'action': action, 'seconds': time.perf_counter() - start})
+        if session.exception:
+            errors.append(session.exception[0].message)
+        if think:
+            time.sleep(rng.uniform(0, 2 * think))
+
+def run_level(n_sessions, interactions, think, seed, timeout, rerun_log):
+    """Run n_sessions analysts at once and summarize their reruns"""
+    sessions = [LoadSession(APP_SCRIPT, default_timeout=timeout) for _ in range(n_sessions)]
+    start_gate = threading.Barrier(n_sessions + 1)
+    samples, errors = [], []
+    threads = [
+        threading.Thread(
+            target=run_session,
+            args=(session, random.Random(seed * 1000 + i), interactions, think, start_gate, samples, errors),
+            daemon=True
+        )
+        for i, session in enumerate(sessions)
+    ]
+    for thread in threads:
+        thread.start()
+    rss_before = rss_bytes()
+    logged_before = len(rerun_log.reruns)
+    start_gate.wait()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - start
+    rss_after = rss_bytes() or 0
+    # ru_maxrss is in KiB on Linux: the peak of the whole process so far
+    rss_peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+    interaction_ms = np.array([s['seconds'] for s in samples if s['action'] != "open"]) * 1000
+    open_ms = np.array([s['seconds'] for s in samples if s['action'] == "open"]) * 1000
+    script_ms = np.array([
+        entry['seconds'] for entry in rerun_log.reruns[logged_before:] if entry.get('scope') == "script"
+    ]) * 1000
+
+    def percentiles(values):
+        if not len(values):
+            return {'p50': None, 'p95': None, 'p99': None}
+        p50, p95, p99 = np.percentile(values, [50, 95, 99])
+        return {'p50': round(p50, 1), 'p95': round(p95, 1), 'p99': round(p99, 1)}
+
+    return {
+        'sessions': n_sessions,
+        'reruns': len(samples),
+        'errors': len(errors),
+        'first_error': errors[0] if errors else None,
+        'seconds': round(wall, 3),
+        'reruns_per_sec': round(len(samples) / wall, 2) if wall > 0 else None,
+        'interaction_ms': percentiles(interaction_ms),
+        'open_ms': percentiles(open_ms),
+        'script_ms': percentiles(script_ms),
+        'rss_before_mb': round((rss_before or 0) / 1e6, 1),
+        'rss_after_mb': round(rss_after / 1e6, 1),
+        'rss_peak_mb': round(max(rss_peak, rss_after) / 1e6, 1)
+    }
+
+def run_load_test(csv_path, levels, interactions=20, think=0.0, seed=0, timeout=600):
+    """
+    Serve csv_path to 1..N concurrent sessions and return a results dict
+    The app runs in a scratch directory holding the CSV as ventas_data.csv,
+    so its snapshots and SQLite database never touch the working tree
+    """
+    install_shared_runtime()
+    rerun_log = RerunLog()
+    perf_logger = logging.getLogger(PERF_LOGGER)
+    perf_logger.addHandler(rerun_log)
+    perf_logger.setLevel(logging.INFO)
+    perf_logger.propagate = False
+
+    results = []
+    workdir_before = os.getcwd()
+    with tempfile.TemporaryDirectory() as appdir:
+        os.symlink(os.path.abspath(csv_path), os.path.join(appdir, "ventas_data.csv"))
+        os.chdir(appdir)
+        try:
+            # The first session pays the process-wide load; keep it out of the levels
+            start = time.perf_counter()
+            warmup = LoadSession(APP_SCRIPT, default_timeout=timeout).run()
+            warmup_seconds = time.perf_counter() - start
+            if warmup.exception:
+                raise RuntimeError(f"The dashboard failed to load: {warmup.exception[0].message}")
+            for level in levels:
+                results.append(run_level(level, interactions, think, seed, timeout, rerun_log))
+        finally:
+            os.chdir(workdir_before)
+
+    return {
+        'meta': {
+            'app_version': get_app_info()['version'],
+            'csv': os.path.basename(csv_path),
+            'interactions': interactions,
+            'think_seconds': think,
+            'seed': seed,
+            'warmup_seconds': round(warmup_seconds, 3),
+            'timestamp': time.strftime("%Y-%m-%dT%H:%M:%S")
+        },
+        'levels': results
+    }
+
+# ─── REPORTING ───────────────────────────────────────────────
+def print_results(results):
+    """Print one line per concurrency level"""
+    meta = results['meta']
+    print(
+        f"{meta['csv']}: {meta['interactions']} filter changes per session, "
+        f"think {meta['think_seconds']}s, first load {meta['warmup_seconds']:.1f}s"
+    )
+    print(
+        f"{'sessions':>8}{'reruns/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+        f"{'script p95':>12}{'open p95':>10}{'RSS MB':>9}{'peak MB':>9}{'errors':>8}"
+    )
+    for level in results['levels']:
+        latency = level['interaction_ms']
+        print(
+            f"{level['sessions']:>8}{level['reruns_per_sec']:>10.2f}"
+            f"{latency['p50'] or 0:>10.1f}{latency['p95'] or 0:>10.1f}{latency['p99'] or 0:>10.1f}"
+            f"{level['script_ms']['p95'] or 0:>12.1f}{level['open_ms']['p95'] or 0:>10.1f}"
+            f"{level['rss_after_mb']:>9.1f}{level['rss_peak_mb']:>9.1f}{level['errors']:>8}"
+        )
+    for level in results['levels']:
+        if level['first_error']:
+            print(f"{level['sessions']} sessions, first error: {level['first_error']}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the dashboard with concurrent headless sessions")
+    parser.add_argument("--csv", help="Existing CSV to serve (skips generation)")
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--vendors", type=int, default=50)
+    parser.add_argument("--products", type=int, default=200)
+    parser.add_argument("--customers", type=int, default=5000)
+    parser.add_argument("--months", type=int, default=12)
+    parser.add_argument("--sessions", default="1,2,4,8", help="Comma-separated concurrency levels")
+    parser.add_argument("--interactions", type=int, default=20, help="Filter changes per session")
+    parser.add_argument("--think", type=float, default=0.0, help="Mean seconds between one session's changes")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--timeout", type=float, default=600, help="Seconds before a rerun counts as hung")
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    args = parser.parse_args()
+    levels = [int(level) for level in args.sessions.split(",")]
+
+    with tempfile.TemporaryDirectory() as workdir:
+        csv_path = args.csv
+        if csv_path is None:
+            csv_path = os.path.join(workdir, f"ventas_{args.rows}.csv")
+            generate_sales_csv(
+                csv_path, args.rows, args.vendors, args.products, args.customers,
+                args.months, seed=args.seed
+            )
+        results = run_load_test(csv_path, levels, args.interactions, args.think, args.seed, args.timeout)
+
+    print_results(results)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as handle:
+            json.dump(results, handle, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -1,52 +1,139 @@
 import streamlit as st
 
 # Import modules
-from config import setup_page_config
-from data_loader import load_sales_data, apply_filters, calculate_kpis
+from config import setup_page_config, get_data_settings, get_chart_settings
+from data_loader import calculate_kpis, KPI_AGGREGATIONS
+from sales_source import load_sales_source
+from sales_trend import build_time_index, build_month_prefix, month_number
+from aggregation_plan import build_plan
+from sales_cube import ROW_COUNT
+from result_cache import get_result_cache, selection_key
 from filters import render_sidebar
 from kpis import render_main_kpis
-from meta_dashboard import render_goal_dashboard
-from charts import render_charts_row1, render_charts_row2, render_charts_row3
+from meta_dashboard import render_goal_dashboard, GOAL_AGGREGATIONS
+from charts import render_charts_row1, render_charts_row2, render_charts_row3, CHART_AGGREGATIONS
+from export import render_export_panel
+from instrumentation import start_rerun, finish_rerun, stage, render_debug_panel
 
 # ─── INITIAL CONFIGURATION ─────────────────────────────────────
 setup_page_config()
+profiler = start_rerun()
 
 # ─── DATA LOADING ───────────────────────────────────────────
-df = load_sales_data()
+# The in-memory snapshot (or incremental frame), the streamed cube or the
+# SQLite table, per config.get_data_settings(); all read through one interface
+data_settings = get_data_settings()
+with stage("load_sales_data") as load_stage:
+    source = load_sales_source()
+    load_info = source.load_info
+    load_stage['rows_out'] = load_info.get('rows')
+    load_stage['mode'] = data_settings['ingest_mode']
 
 # ─── SIDEBAR WITH FILTERS ───────────────────────────────────────
-regions, categories, channels, salespeople = render_sidebar(df)
+regions, categories, channels, salespeople, date_range = render_sidebar(source.dimensions, source.date_bounds)
 
 # ─── APPLY FILTERS ───────────────────────────────────────────
-filtered_df = apply_filters(df, regions, categories, channels, salespeople)
+with stage("apply_filters", load_info.get('rows')) as filter_stage:
+    selection = source.where(regions, categories, channels, salespeople, date_range)
+    # Every selected row when they are in memory, else a bounded page
+    filtered_df = selection.detail_rows()
+    filter_stage['rows_out'] = len(filtered_df)
+
+# ─── SHARED AGGREGATION PLAN ─────────────────────────────────
+# Every metric and group-by the page needs, computed in one pass
+page_plan = build_plan({**KPI_AGGREGATIONS, **GOAL_AGGREGATIONS, **CHART_AGGREGATIONS})
+# Monthly KPI totals over every date, for MoM/YoY deltas under a date range
+monthly_plan = build_plan({'kpi_monthly': KPI_AGGREGATIONS['kpi_monthly']})
+customer_top_k = get_chart_settings()['top_k']['cliente']
+
+def compute_page_results():
+    """Compute every KPI and aggregate the page needs from the selection"""
+    with stage("execute_plan") as plan_stage:
+        aggregates = selection.execute_plan(page_plan)
+        plan_stage['rows_out'] = aggregates['totals'][ROW_COUNT]
+    monthly = aggregates['kpi_monthly']
+    if date_range is not None:
+        with stage("period_totals"):
+            monthly = source.where(regions, categories, channels, salespeople).execute_plan(monthly_plan)['kpi_monthly']
+    with stage("calculate_kpis"):
+        kpis = calculate_kpis(None, aggregates=aggregates, unique_customers=selection.count_distinct("cliente"))
+    with stage("customer_ranking"):
+        # Customers are not a cube dimension: None when no rows are kept
+        aggregates['customer_ranking'] = selection.top_k("cliente", "ventas_total", customer_top_k)
+    with stage("daily_sales"):
+        daily = selection.daily_sales()
+    return {
+        'aggregates': aggregates, 'kpis': kpis, 'month_prefix': build_month_prefix(monthly),
+        # Without row dates the trend is drawn from the monthly aggregate
+        'time_index': None if daily is None else build_time_index(daily)
+    }
+
+# Shared across sessions: a selection is computed once per data version
+data_version = load_info.get('data_version')
+with stage("page_results") as results_stage:
+    results_stage['cache'] = "hit"
+    
+    def compute_on_miss():
+        results_stage['cache'] = "miss"
+        return compute_page_results()
+    
+    page_results = get_result_cache().get_or_compute(
+        data_version,
+        selection_key(data_version, regions, categories, channels, salespeople, date_range),
+        compute_on_miss
+    )
+aggregates = page_results['aggregates']
 
 # ─── MAIN HEADER ───────────────────────────────────────────
 st.title("📊 Sales Analytics Pro - 2024")
 st.markdown("---")
 
+# Every section below is a fragment fed only the results it draws: a widget
+# inside one (MoM/YoY, goal view, trend resolution, table paging, export
+# format) reruns that section alone, not the loading and filtering above
 # ─── MAIN KPIS ───────────────────────────────────────────
-kpis = calculate_kpis(filtered_df)
-render_main_kpis(kpis)
+render_main_kpis(
+    page_results['kpis'], page_results['month_prefix'],
+    month_number((date_range or source.date_bounds)[1]) if source.date_bounds else None
+)
 
 st.markdown("---")
 
 # ─── GOAL TRACKING DASHBOARD ─────────────────────────────────
-render_goal_dashboard(filtered_df, salespeople)
+render_goal_dashboard(aggregates['salesperson_months'], salespeople)
 
 st.markdown("---")
 
 # ─── MAIN CHARTS ─────────────────────────────────────────────
 st.subheader("📈 Sales Analysis Dashboard")
 
-# Row 1: Monthly sales + Regional sales
-render_charts_row1(filtered_df)
+# Row 1: Sales trend + Regional sales
+render_charts_row1(aggregates['monthly_sales'], aggregates['regional_sales'], page_results['time_index'])
 
 # Row 2: Product sales + Salesperson performance  
-render_charts_row2(filtered_df)
+render_charts_row2(aggregates['product_sales'], aggregates['salesperson_sales'])
 
 # Row 3: Channel sales + Transaction table
-render_charts_row3(filtered_df)
+render_charts_row3(
+    aggregates['channel_sales'], aggregates.get('customer_ranking'), filtered_df,
+    total_rows=aggregates['totals'][ROW_COUNT]
+)
+
+# ─── DATA EXPORT ─────────────────────────────────────────────
+st.markdown("---")
+render_export_panel(selection, aggregates)
 
 # ─── FOOTER ───────────────────────────────────────────────────
 st.markdown("---")
-st.caption("Sales Analytics Pro v2.0.0 | Built with Streamlit + Plotly | Data: ventas_data.csv")
+st.caption(
+    f"Sales Analytics Pro v2.0.0 | Built with Streamlit + Plotly | Data: ventas_data.csv "
+    f"({load_info.get('rows', 0):,} rows, snapshot {load_info.get('snapshot', 'n/a')}) | "
+    f"Data version {load_info.get('data_version', 'n/a')}, loaded {load_info.get('loaded_at', 'n/a')} "
+    f"in {load_info.get('seconds', 0)}s"
+)
+if source.refresh_error:
+    st.caption(f"⚠️ Background refresh failed, still serving the version above: {source.refresh_error}")
+
+# ─── PERFORMANCE DEBUG ───────────────────────────────────────
+render_debug_panel(profiler, source.frame)
+finish_rerun()
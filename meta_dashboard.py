@@ -2,69 +2,108 @@ import streamlit as st
 import plotly.graph_objects as go
 from config import get_theme_colors
 from kpis import render_goal_kpis
+from instrumentation import instrumented, fragment
+from figure_cache import cached_figure
+from goal_attainment import (
+    GOAL_AGGREGATIONS, GOAL_SORT_COLUMNS, goal_attainment, goal_totals,
+    top_n, worst_n, sort_attainment
+)
 
-def render_goal_dashboard(df, salespeople):
+GOAL_VIEWS = ["Top performers", "Needs attention", "All (sortable)"]
+
+def build_goal_gauge_figure(progress_pct, total_target):
+    """Team goal progress gauge (memoized by figure_cache)"""
+    colors = get_theme_colors()
+    fig_gauge = go.Figure(go.Indicator(
+        mode = "gauge+number+delta",
+        value = progress_pct,
+        domain = {'x': [0, 1], 'y': [0, 1]},
+        title = {'text': f"Goal Progress<br><span style='font-size:0.8em;color:gray'>Target: ${total_target:,.0f}</span>"},
+        delta = {'reference': 100},
+        gauge = {
+            'axis': {'range': [None, 100]},
+            'bar': {'color': colors['primary']},
+            'steps': [
+                {'range': [0, 50], 'color': colors['secondary_bg']},
+                {'range': [50, 80], 'color': "#2D2D3D"},
+                {'range': [80, 100], 'color': "#3D3D4D"}
+            ],
+            'threshold': {
+                'line': {'color': colors['danger'], 'width': 4},
+                'thickness': 0.75,
+                'value': 90
+            }
+        }
+    ))
+    fig_gauge.update_layout(height=300, font={'color': colors['text']})
+    return fig_gauge
+
+def render_salesperson_goals(attainment):
+    """Render the ranked per-salesperson goal attainment views"""
+    col_view, col_n = st.columns([2, 1])
+    with col_view:
+        view = st.selectbox("View", GOAL_VIEWS, key="goal_view")
+    with col_n:
+        n = st.number_input("N", min_value=1, max_value=max(len(attainment), 1), value=min(3, max(len(attainment), 1)), key="goal_top_n")
+    
+    if view == GOAL_VIEWS[0]:
+        shown = top_n(attainment, int(n))
+    elif view == GOAL_VIEWS[1]:
+        shown = worst_n(attainment, int(n))
+    else:
+        col_sort, col_order = st.columns([2, 1])
+        with col_sort:
+            sort_label = st.selectbox("Sort by", list(GOAL_SORT_COLUMNS), key="goal_sort_by")
+        with col_order:
+            ascending = st.selectbox("Order", ["Descending", "Ascending"], key="goal_order") == "Ascending"
+        shown = sort_attainment(attainment, GOAL_SORT_COLUMNS[sort_label], ascending)
+    
+    st.dataframe(
+        shown[["rank", "vendedor", "sales", "target", "achievement_%"]],
+        use_container_width=True, hide_index=True, height=200,
+        column_config={
+            'rank': st.column_config.NumberColumn("#"),
+            'vendedor': "Salesperson",
+            'sales': st.column_config.NumberColumn("Sales", format="dollar"),
+            'target': st.column_config.NumberColumn("Target", format="dollar"),
+            'achievement_%': st.column_config.ProgressColumn("Achievement", format="%.1f%%", min_value=0, max_value=100)
+        }
+    )
+
+@fragment
+@instrumented
+def render_goal_dashboard(salesperson_months, salespeople):
     """
     Render goal dashboard with gauge chart and related KPIs
+    salesperson_months: the GOAL_AGGREGATIONS aggregate. A fragment: the
+    view and sort controls rerun only this section
     """
-    colors = get_theme_colors()
+    attainment = goal_attainment(salesperson_months)
+    totals = goal_totals(attainment)
     
     st.subheader("🎯 Goal Tracking & Progress")
     col_gauge1, col_gauge2 = st.columns(2)
     
     with col_gauge1:
-        # Calculate goal progress for selected salespeople
+        # Team progress: monthly targets counted once per salesperson-month
         if len(salespeople) > 0:
-            avg_target = df[df["vendedor"].isin(salespeople)]["meta_mensual"].mean()
-            current_sales = df[df["vendedor"].isin(salespeople)]["ventas_total"].sum()
-            if avg_target > 0:
-                progress_pct = min((current_sales / avg_target) * 100, 100)
-            else:
-                progress_pct = 0
+            total_target = totals['meta_mensual']
+            progress_pct = min(totals['achievement_%'], 100)
         else:
             progress_pct = 0
-            avg_target = 0
+            total_target = 0
         
-        # Create gauge chart
-        fig_gauge = go.Figure(go.Indicator(
-            mode = "gauge+number+delta",
-            value = progress_pct,
-            domain = {'x': [0, 1], 'y': [0, 1]},
-            title = {'text': f"Goal Progress<br><span style='font-size:0.8em;color:gray'>Target: ${avg_target:,.0f}</span>"},
-            delta = {'reference': 100},
-            gauge = {
-                'axis': {'range': [None, 100]},
-                'bar': {'color': colors['primary']},
-                'steps': [
-                    {'range': [0, 50], 'color': colors['secondary_bg']},
-                    {'range': [50, 80], 'color': "#2D2D3D"},
-                    {'range': [80, 100], 'color': "#3D3D4D"}
-                ],
-                'threshold': {
-                    'line': {'color': colors['danger'], 'width': 4},
-                    'thickness': 0.75,
-                    'value': 90
-                }
-            }
-        ))
-        fig_gauge.update_layout(height=300, font={'color': colors['text']})
-        st.plotly_chart(fig_gauge, use_container_width=True)
+        st.plotly_chart(cached_figure(build_goal_gauge_figure, progress_pct, total_target), use_container_width=True)
     
     with col_gauge2:
         # Goal KPIs
-        achievement_rate = render_goal_kpis(df)
+        achievement_rate = render_goal_kpis(totals)
         
         # Additional metrics
         st.markdown("---")
         st.markdown("**Salesperson Performance:**")
         if len(salespeople) > 0:
-            for salesperson in salespeople[:3]:  # Show up to 3 salespeople
-                person_data = df[df["vendedor"] == salesperson]
-                person_target = person_data["meta_mensual"].mean()
-                person_sales = person_data["ventas_total"].sum()
-                person_achievement = (person_sales / person_target * 100) if person_target > 0 else 0
-                
-                st.markdown(f"• {salesperson}: {person_achievement:.1f}%")
+            render_salesperson_goals(attainment)
         else:
             st.markdown("• Select salespeople to see details")
     
@@ -0,0 +1,101 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from config import get_data_settings
+
+# Rows are partitioned by month: every aggregate the dashboard computes on
+# rows or on the cube groups by it, so partitions never share a group
+PARTITION_COLUMN = "mes"
+
+@st.cache_resource
+def get_executor(workers):
+    """Process-wide thread pool (pandas/numpy kernels release the GIL)"""
+    return ThreadPoolExecutor(max_workers=workers, thread_name_prefix="partition")
+
+def parallel_workers(n_rows, workers=None):
+    """Worker count to use for n_rows, 1 when the serial path is cheaper"""
+    settings = get_data_settings()
+    workers = settings['parallel_workers'] if workers is None else workers
+    return workers if workers > 1 and n_rows >= settings['parallel_min_rows'] else 1
+
+def partition_positions(df, n_partitions, column=PARTITION_COLUMN):
+    """
+    Split row positions into about n_partitions groups of whole months
+    Months are assigned to contiguous, row-balanced groups; positions stay
+    ascending within each group
+    """
+    if isinstance(df[column].dtype, pd.CategoricalDtype):
+        codes = df[column].cat.codes.to_numpy().astype(np.int64) + 1
+    else:
+        codes = pd.factorize(df[column], use_na_sentinel=False)[0]
+    if not len(codes):
+        return []
+    counts = np.bincount(codes)
+    # Month -> partition, cutting the running row count into equal shares
+    shares = np.cumsum(counts) - counts
+    month_partition = np.minimum(shares * n_partitions // len(codes), n_partitions - 1)
+    row_partition = month_partition[codes]
+    order = np.argsort(row_partition, kind="stable")
+    sizes = np.bincount(row_partition, minlength=n_partitions)
+    return [part for part in np.split(order, np.cumsum(sizes)[:-1]) if len(part)]
+
+def _unify_categories(results, source):
+    """
+    Give categorical columns of the partial results one shared dtype
+    Matches astype("category") on the whole source column: the source dtype
+    when it is already categorical, else the sorted union of values
+    """
+    for column in results[0].columns:
+        if not isinstance(results[0][column].dtype, pd.CategoricalDtype):
+            continue
+        if column in source and isinstance(source[column].dtype, pd.CategoricalDtype):
+            categories = source[column].cat.categories
+        else:
+            categories = pd.Index(
+                np.concatenate([result[column].cat.categories.to_numpy() for result in results])
+            ).unique().sort_values()
+        for result in results:
+            result[column] = result[column].cat.set_categories(categories)
+
+def partitioned_aggregate(df, keys, aggregate, workers):
+    """
+    Run aggregate(partition) over `workers` month partitions in a thread pool
+    `aggregate` must group by `keys` (which include the partition column)
+    with sort=False. Partial results are concatenated in the order of each
+    group's first row in df, so the output is identical to aggregate(df).
+    """
+    if workers <= 1 or PARTITION_COLUMN not in keys:
+        return aggregate(df)
+    partitions = partition_positions(df, workers)
+    if len(partitions) <= 1:
+        return aggregate(df)
+
+    def run(positions):
+        part = df.take(positions)
+        result = aggregate(part)
+        # Groups come out in first-appearance order; record where each starts
+        group_ids = part.groupby(keys, observed=True, dropna=False, sort=False).ngroup().to_numpy()
+        _, first = np.unique(group_ids, return_index=True)
+        return result, positions[first]
+
+    outputs = list(get_executor(workers).map(run, partitions))
+    results = [result for result, _ in outputs]
+    _unify_categories(results, df)
+    merged = pd.concat(results, ignore_index=True)
+    first_rows = np.concatenate([first for _, first in outputs])
+    return merged.take(np.argsort(first_rows, kind="stable")).reset_index(drop=True)
+
+def count_unique(values, workers):
+    """
+    Distinct non-null values of a Series
+    Contiguous chunks are deduplicated in parallel, then their uniques merged
+    """
+    if workers <= 1:
+        return values.nunique()
+    bounds = np.linspace(0, len(values), workers + 1).astype(np.int64)
+    chunks = [values.iloc[start:stop] for start, stop in zip(bounds[:-1], bounds[1:])]
+    uniques = list(get_executor(workers).map(lambda chunk: chunk.dropna().unique(), chunks))
+    return pd.Series(np.concatenate([np.asarray(u) for u in uniques])).nunique()
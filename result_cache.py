@@ -0,0 +1,111 @@
+import hashlib
+import json
+import sys
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+import streamlit as st
+
+from config import get_cache_settings
+
+def selection_key(data_version, regions, categories, channels, salespeople, date_range=None):
+    """Canonical, order-insensitive hash of a sidebar selection on one data version"""
+    selection = [
+        str(data_version),
+        *[sorted({str(value) for value in values}) for values in (regions, categories, channels, salespeople)]
+    ]
+    if date_range is not None:
+        selection.append([day.isoformat() for day in date_range])
+    canonical = json.dumps(selection, ensure_ascii=False)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+def estimate_bytes(value):
+    """Approximate memory held by a cached result"""
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        usage = value.memory_usage(deep=True)
+        return int(usage.sum() if isinstance(value, pd.DataFrame) else usage)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_bytes(item) for item in value.values())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(estimate_bytes(item) for item in value)
+    return sys.getsizeof(value)
+
+class ResultCache:
+    """
+    Thread-safe LRU cache bounded by entry count and approximate bytes
+    `sizeof` measures a value's footprint (estimate_bytes by default)
+    """
+    
+    def __init__(self, max_entries, max_bytes, sizeof=estimate_bytes):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._data_version = None
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    def _reset(self, data_version):
+        """Drop every entry computed on an older data version"""
+        self._entries.clear()
+        self._bytes = 0
+        self._data_version = data_version
+    
+    def get_or_compute(self, data_version, key, compute):
+        """
+        Return the cached result for key, computing and storing it on a miss
+        A new data version invalidates every existing entry
+        """
+        with self._lock:
+            if data_version != self._data_version:
+                self._reset(data_version)
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key][0]
+            self.misses += 1
+        
+        # Compute outside the lock so other sessions are not blocked
+        value = compute()
+        size = self.sizeof(value)
+        
+        with self._lock:
+            if data_version != self._data_version or size > self.max_bytes:
+                return value
+            if key not in self._entries:
+                self._entries[key] = (value, size)
+                self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+        return value
+    
+    def clear(self):
+        """Remove every entry (counters are kept)"""
+        with self._lock:
+            self._reset(self._data_version)
+    
+    def stats(self):
+        """Return hit/miss counters and current size"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'data_version': self._data_version
+            }
+
+@st.cache_resource
+def get_result_cache():
+    """Process-wide result cache shared by every session"""
+    settings = get_cache_settings()
+    return ResultCache(settings['result_cache_entries'], settings['result_cache_bytes'])
@@ -0,0 +1,77 @@
+import pandas as pd
+
+from filter_index import build_dimension_dictionary
+from parallel_engine import partitioned_aggregate
+from compact_storage import is_month_code, measure_frame, month_categorical
+
+# Cube grain: every chart and KPI groups on a subset of these keys
+CUBE_DIMENSIONS = ["mes", "region", "categoria", "canal", "vendedor", "producto"]
+CUBE_MEASURES = ["ventas_total", "costo_total", "ganancia", "unidades", "meta_mensual"]
+
+# Row count per cell; lets per-row means be answered as sum / count
+ROW_COUNT = "transacciones"
+
+# Measures rolled up with max instead of sum: {cube column: source column}.
+# meta_mensual repeats on every row, so targets are counted once per
+# salesperson-month from its max
+MAX_MEASURES = {"meta_mensual_max": "meta_mensual"}
+
+def build_sales_cube(df, workers=1):
+    """
+    Pre-aggregate transactions to one row per dimension combination
+    Measures keep their column names so slices group exactly like rows;
+    compact frames get their derived metrics computed here.
+    With workers > 1, month partitions are aggregated in parallel.
+    """
+    if workers > 1:
+        return partitioned_aggregate(df, CUBE_DIMENSIONS, build_sales_cube, workers)
+    
+    keys = df[CUBE_DIMENSIONS].copy()
+    if is_month_code(keys["mes"]):
+        # Compact frames: the cube stores month labels like standard ones
+        keys["mes"] = month_categorical(keys["mes"].to_numpy())
+    for dim in CUBE_DIMENSIONS:
+        if not isinstance(keys[dim].dtype, pd.CategoricalDtype):
+            keys[dim] = keys[dim].astype("category")
+    
+    grouped = pd.concat([keys, measure_frame(df, CUBE_MEASURES + ["margen_%"])], axis=1).groupby(
+        CUBE_DIMENSIONS, observed=True, dropna=False, sort=False
+    )
+    cube = grouped[CUBE_MEASURES].sum()
+    for column, source in MAX_MEASURES.items():
+        cube[column] = grouped[source].max()
+    cube["margen_%"] = grouped["margen_%"].sum()
+    cube["margen_filas"] = grouped["margen_%"].count()
+    cube[ROW_COUNT] = grouped.size()
+    return cube.reset_index()
+
+def merge_cubes(cube, other):
+    """
+    Combine two cubes into one, summing cells present in both
+    Costs O(cube cells), independent of the number of transactions
+    """
+    cube, other = cube.copy(), other.copy()
+    for dim in CUBE_DIMENSIONS:
+        categories = union_categories(cube[dim], other[dim])
+        cube[dim] = cube[dim].cat.set_categories(categories)
+        other[dim] = other[dim].cat.set_categories(categories)
+    
+    measures = [col for col in cube.columns if col not in CUBE_DIMENSIONS]
+    merged = pd.concat([cube, other], ignore_index=True).groupby(
+        CUBE_DIMENSIONS, observed=True, dropna=False, sort=False
+    )[measures].agg({col: "max" if col in MAX_MEASURES else "sum" for col in measures})
+    return merged.reset_index()
+
+def union_categories(existing, appended):
+    """Categories of `existing` followed by values first seen in `appended`"""
+    known = existing.cat.categories
+    new_values = pd.Index(appended.dropna().unique().tolist())
+    return known.append(new_values[~new_values.isin(known)])
+
+def cube_dimension_dictionary(cube):
+    """Sidebar value dictionaries and co-occurrence counts of a cube"""
+    return build_dimension_dictionary(cube, cube[ROW_COUNT], cube["ventas_total"])
+
+def is_cube(frame):
+    """Return True if the frame is a cube slice rather than raw rows"""
+    return ROW_COUNT in frame.columns
@@ -0,0 +1,86 @@
+from config import get_data_settings
+
+def sidebar_selections(regions, categories, channels, salespeople):
+    """{dimension: selected values} of the sidebar filters"""
+    return {
+        'region': regions,
+        'categoria': categories,
+        'canal': channels,
+        'vendedor': salespeople
+    }
+
+class SalesSource:
+    """
+    A loaded sales dataset, whatever stores it
+    The page reads every source through this interface. Implementations
+    set `dimensions` (the sidebar dimension dictionary), `date_bounds`
+    ((first, last) dates, None when the date filter is not offered) and
+    `load_info`:
+    - data_loader.FrameSalesSource: the in-memory frame (the default)
+    - streaming_loader.StreamedSalesSource: the cube streamed from the CSV
+    - sql_backend.SQLiteSalesSource: the SQLite table
+    """
+    dimensions = None
+    date_bounds = None
+    load_info = {}
+    # A failed background refresh still serving the previous data, or None
+    refresh_error = None
+    # The rows held in memory (for the debug panel), None when not loaded
+    frame = None
+
+    def where(self, regions, categories, channels, salespeople, date_range=None):
+        """The rows of a sidebar selection and inclusive date range, as a SalesSelection"""
+        raise NotImplementedError
+
+class SalesSelection:
+    """
+    A sidebar selection over a SalesSource
+    Every method answers from the source's own storage; only aggregates
+    and bounded rows reach the page
+    """
+
+    def execute_plan(self, plan):
+        """Every aggregation of an aggregation_plan.build_plan() plan, as execute_plan() returns them"""
+        raise NotImplementedError
+
+    def count_distinct(self, column):
+        """Distinct non-null values of a column"""
+        raise NotImplementedError
+
+    def top_k(self, key, by, k):
+        """
+        The k `key` values with the largest sum of `by` as a
+        top_k.top_k_ranking() result, or None when the source cannot rank them
+        """
+        raise NotImplementedError
+
+    def daily_sales(self):
+        """Sales per day (fecha, ventas_total) in date order, or None without row dates"""
+        raise NotImplementedError
+
+    def detail_rows(self):
+        """Rows the transaction table pages through (at most detail_row_limit unless in memory)"""
+        raise NotImplementedError
+
+    def iter_rows(self, chunk_rows):
+        """Every selected row, in the standard layout, `chunk_rows` at a time"""
+        raise NotImplementedError
+
+def load_sales_source():
+    """
+    The configured source: the SQLite table with backend = "sqlite", else
+    the streamed cube, the incremental frame or the shared snapshot by
+    ingest_mode
+    """
+    # The implementations import this module for the interface
+    settings = get_data_settings()
+    if settings['backend'] == "sqlite":
+        from sql_backend import load_sqlite_source
+        return load_sqlite_source()
+    if settings['ingest_mode'] == "streaming":
+        from streaming_loader import load_streamed_source
+        return load_streamed_source()
+    from data_loader import FrameSalesSource, get_shared_sales_data
+    from incremental_loader import get_incremental_sales_data
+    holder = get_incremental_sales_data() if settings['ingest_mode'] == "incremental" else get_shared_sales_data()
+    return FrameSalesSource(holder.refresh(), getattr(holder, "last_error", None))
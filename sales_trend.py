@@ -0,0 +1,207 @@
+import numpy as np
+import pandas as pd
+
+# Trend resolutions, finest first: {name: pandas period frequency}
+TREND_GRANULARITIES = {
+    'day': "D",
+    'week': "W-SUN",
+    'month': "M",
+    'quarter': "Q"
+}
+
+TREND_MEASURE = "ventas_total"
+
+# Period-over-period comparisons: {name: months back}
+PERIOD_SHIFTS = {
+    'MoM': 1,
+    'YoY': 12
+}
+
+def _day_numbers(dates):
+    """Days since the epoch (int64) for a datetime-like array"""
+    return np.asarray(dates, dtype="datetime64[D]").astype(np.int64)
+
+def _time_index(days, values, order):
+    """Assemble a time index from day numbers and values already in date order"""
+    prefix = np.zeros(len(values) + 1)
+    np.cumsum(values, out=prefix[1:])
+    return {'order': order, 'days': days, 'values': values, 'prefix': prefix}
+
+def build_time_index(df):
+    """
+    Sort transactions by date once per data version
+    Keeps the row positions in date order, their day numbers and sales, and
+    the running sales total so unfiltered buckets cost O(buckets)
+    """
+    days = _day_numbers(df["fecha"].to_numpy())
+    valid = np.flatnonzero(~pd.isna(df["fecha"]).to_numpy())
+    order = valid[np.argsort(days[valid], kind="stable")]
+    values = df[TREND_MEASURE].to_numpy(dtype=np.float64)[order]
+    return _time_index(days[order], values, order)
+
+def extend_time_index(index, new_rows):
+    """
+    Add appended rows (positioned after the indexed ones) to a time index
+    Tails that start on or after the last indexed day are appended in O(new rows)
+    """
+    offset = new_rows.index[0] if len(new_rows) else 0
+    tail = build_time_index(new_rows.reset_index(drop=True))
+    if not len(tail['days']):
+        return index
+    tail_order = tail['order'] + offset
+
+    if not len(index['days']) or tail['days'][0] >= index['days'][-1]:
+        prefix = np.concatenate([index['prefix'], index['prefix'][-1] + tail['prefix'][1:]])
+        return {
+            'order': np.concatenate([index['order'], tail_order]),
+            'days': np.concatenate([index['days'], tail['days']]),
+            'values': np.concatenate([index['values'], tail['values']]),
+            'prefix': prefix
+        }
+
+    # Back-dated rows: stable merge of the two sorted runs
+    days = np.concatenate([index['days'], tail['days']])
+    merge = np.argsort(days, kind="stable")
+    values = np.concatenate([index['values'], tail['values']])[merge]
+    return _time_index(days[merge], values, np.concatenate([index['order'], tail_order])[merge])
+
+def daily_totals(index, mask=None):
+    """
+    Sales per day (fecha, ventas_total) of the rows a time index covers
+    mask: boolean row mask (None = all rows); days are already sorted, so
+    each day is one contiguous run of the index
+    """
+    days, values = index['days'], index['values']
+    if mask is not None:
+        keep = np.asarray(mask)[index['order']]
+        days, values = days[keep], values[keep]
+    starts = np.flatnonzero(np.diff(days, prepend=days[:1] - 1)) if len(days) else np.array([], dtype=np.int64)
+    return pd.DataFrame({
+        'fecha': days[starts].astype("datetime64[D]").astype("datetime64[ns]"),
+        TREND_MEASURE: np.add.reduceat(values, starts) if len(starts) else np.array([], dtype=np.float64)
+    })
+
+def time_index_from_months(monthly_sales):
+    """Time index over monthly totals (one point per month start), e.g. from the cube"""
+    months = pd.PeriodIndex(monthly_sales["mes"].astype(str), freq="M")
+    frame = pd.DataFrame({'fecha': months.to_timestamp(), TREND_MEASURE: monthly_sales[TREND_MEASURE].to_numpy()})
+    return build_time_index(frame)
+
+def date_bounds(index):
+    """First and last indexed day as dates, or None for an empty index"""
+    if not len(index['days']):
+        return None
+    return tuple(pd.Timestamp(day, unit="D").date() for day in (index['days'][0], index['days'][-1]))
+
+def date_slice(index, start, end):
+    """
+    Positions [lo, hi) of the days in [start, end] (inclusive dates)
+    Two binary searches on the sorted days: the rows of a date range are
+    index['order'][lo:hi], without scanning the dates
+    """
+    first, last = _day_numbers(np.array([start, end], dtype="datetime64[D]"))
+    return (
+        int(np.searchsorted(index['days'], first, side="left")),
+        int(np.searchsorted(index['days'], last, side="right"))
+    )
+
+def slice_time_index(index, lo, hi):
+    """Time index of the sorted positions [lo, hi) (views, no copies)"""
+    return {
+        'order': index['order'][lo:hi],
+        'days': index['days'][lo:hi],
+        'values': index['values'][lo:hi],
+        'prefix': index['prefix'][lo:hi + 1]
+    }
+
+def _bucket_starts(first_day, last_day, granularity):
+    """Day numbers of every bucket start covering [first_day, last_day]"""
+    periods = pd.period_range(
+        pd.Timestamp(first_day, unit="D"), pd.Timestamp(last_day, unit="D"),
+        freq=TREND_GRANULARITIES[granularity]
+    )
+    return _day_numbers(periods.start_time)
+
+def choose_granularity(first_day, last_day, max_points, finest="day"):
+    """Finest resolution (not finer than `finest`) with at most max_points buckets"""
+    names = list(TREND_GRANULARITIES)
+    for granularity in names[names.index(finest):]:
+        if len(_bucket_starts(first_day, last_day, granularity)) <= max_points:
+            return granularity
+    return names[-1]
+
+def sales_trend(index, mask=None, granularity="auto", max_points=120, finest="day"):
+    """
+    Sales per time bucket for the selected rows
+    mask: boolean row mask (None = all rows). With granularity "auto" the
+    resolution follows the visible date span; when the buckets still exceed
+    max_points, consecutive buckets are summed together so totals are kept.
+    Returns (frame with `periodo` and ventas_total, granularity, buckets per point)
+    """
+    days, prefix = index['days'], index['prefix']
+    if mask is not None:
+        keep = np.asarray(mask)[index['order']]
+        days = days[keep]
+        prefix = np.zeros(len(days) + 1)
+        np.cumsum(index['values'][keep], out=prefix[1:])
+    if granularity == "auto":
+        granularity = choose_granularity(days[0], days[-1], max_points, finest) if len(days) else finest
+    if not len(days):
+        return pd.DataFrame({'periodo': pd.to_datetime([]), TREND_MEASURE: []}), granularity, 1
+
+    starts = _bucket_starts(days[0], days[-1], granularity)
+
+    # Downsample: merge every `step` consecutive buckets
+    step = max(-(-len(starts) // max_points), 1)
+    starts = starts[::step]
+
+    # Days are sorted, so each bucket is a contiguous run of the prefix sums
+    bounds = np.searchsorted(days, starts, side="left")
+    bounds = np.append(bounds, len(days))
+    trend = pd.DataFrame({
+        'periodo': starts.astype("datetime64[D]").astype("datetime64[ns]"),
+        TREND_MEASURE: prefix[bounds[1:]] - prefix[bounds[:-1]]
+    })
+    return trend, granularity, step
+
+# ─── PERIOD COMPARISON ────────────────────────────────────────
+def month_number(day):
+    """Months since 1970-01 of a date (same numbering as compact_storage.month_codes)"""
+    return (day.year - 1970) * 12 + day.month - 1
+
+def build_month_prefix(monthly):
+    """
+    Running totals per month of a monthly aggregate
+    monthly: one row per 'mes' ('YYYY-MM') with summed columns. Months
+    between the first and the last one count as zero, so the sum of any
+    month range is one subtraction per column
+    """
+    columns = [col for col in monthly.columns if col != "mes"]
+    if not len(monthly):
+        return {'first': 0, 'months': 0, 'prefix': {col: np.zeros(1) for col in columns}}
+    periods = pd.PeriodIndex(monthly["mes"].astype(str), freq="M")
+    numbers = np.asarray((periods.year - 1970) * 12 + periods.month - 1, dtype=np.int64)
+    first = int(numbers.min())
+    months = int(numbers.max()) - first + 1
+    prefix = {}
+    for col in columns:
+        totals = np.bincount(numbers - first, weights=monthly[col].to_numpy(dtype=np.float64), minlength=months)
+        prefix[col] = np.concatenate(([0.0], np.cumsum(totals)))
+    return {'first': first, 'months': months, 'prefix': prefix}
+
+def period_totals(month_prefix, start, end):
+    """Column totals over months [start, end] (month numbers), or None outside the indexed months"""
+    lo, hi = start - month_prefix['first'], end - month_prefix['first'] + 1
+    if lo < 0 or hi > month_prefix['months'] or lo >= hi:
+        return None
+    return {col: prefix[hi] - prefix[lo] for col, prefix in month_prefix['prefix'].items()}
+
+def compare_periods(month_prefix, month, shift, months=1):
+    """
+    Totals of the `months` months ending at `month` and of the same span
+    `shift` months earlier: (current, previous), either None without data
+    """
+    return (
+        period_totals(month_prefix, month - months + 1, month),
+        period_totals(month_prefix, month - months + 1 - shift, month - shift)
+    )
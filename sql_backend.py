@@ -0,0 +1,321 @@
+import argparse
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from contextlib import closing
+
+import pandas as pd
+import streamlit as st
+
+from config import get_data_settings
+from data_loader import derive_sales_columns
+from filter_index import FILTER_DIMENSIONS, build_dimension_dictionary
+from sales_cube import MAX_MEASURES, ROW_COUNT
+from aggregation_plan import COUNT_COLUMNS, execute_plan
+from top_k import append_other
+from sales_source import SalesSource, SalesSelection, sidebar_selections
+
+SALES_TABLE = "ventas"
+
+# Single-column indexes for the sidebar filters and the date; the planner
+# picks the most selective one from the ANALYZE statistics
+INDEXED_COLUMNS = FILTER_DIMENSIONS + ["fecha"]
+
+def _quote(name):
+    """Quote a column name for SQL (margen_% is not a bare identifier)"""
+    return '"' + name.replace('"', '""') + '"'
+
+# pandas dtype of each SQLite column type written by to_sql (others are text)
+SQL_DTYPES = {"INTEGER": "int64", "REAL": "float64"}
+
+# SQL for the helper counts every aggregate carries
+COUNT_EXPRESSIONS = {ROW_COUNT: "COUNT(*)", "margen_filas": f"COUNT({_quote('margen_%')})"}
+
+# ─── DATABASE BUILD ───────────────────────────────────────────
+# Size and mtime of the CSV a database was imported from
+BUILD_INFO_TABLE = "build_info"
+
+# One import at a time per process; reruns that find the database missing
+# or stale wait for it instead of importing it again
+_build_lock = threading.Lock()
+
+def build_database(csv_path=None, db_path=None, chunk_rows=None):
+    """
+    Import the CSV, with its derived columns, into an indexed SQLite table
+    The file is written to a unique temporary name and renamed into place
+    when complete; the source CSV's size and mtime are stored with it
+    """
+    settings = get_data_settings()
+    csv_path = csv_path or settings['csv_path']
+    db_path = db_path or settings['database_path']
+    chunk_rows = chunk_rows or settings['chunk_rows']
+    start = time.perf_counter()
+    # Taken before reading: rows appended during the import make it stale
+    stat = os.stat(csv_path)
+
+    handle, partial = tempfile.mkstemp(
+        dir=os.path.dirname(db_path) or ".", prefix=os.path.basename(db_path) + ".", suffix=".tmp"
+    )
+    os.close(handle)
+    rows = 0
+    try:
+        with closing(sqlite3.connect(partial)) as connection:
+            for chunk in pd.read_csv(csv_path, chunksize=chunk_rows):
+                chunk = derive_sales_columns(chunk)
+                chunk["fecha"] = chunk["fecha"].dt.strftime("%Y-%m-%d")
+                chunk.astype({dim: str for dim in FILTER_DIMENSIONS}).to_sql(
+                    SALES_TABLE, connection, if_exists="append", index=False
+                )
+                rows += len(chunk)
+            for column in INDEXED_COLUMNS:
+                connection.execute(
+                    f"CREATE INDEX IF NOT EXISTS {_quote(f'idx_{SALES_TABLE}_{column}')} "
+                    f"ON {SALES_TABLE} ({_quote(column)})"
+                )
+            connection.execute(f"CREATE TABLE {BUILD_INFO_TABLE} (size INTEGER, mtime_ns INTEGER)")
+            connection.execute(f"INSERT INTO {BUILD_INFO_TABLE} VALUES (?, ?)", (stat.st_size, stat.st_mtime_ns))
+            connection.execute("ANALYZE")
+            connection.commit()
+        os.replace(partial, db_path)
+    finally:
+        if os.path.exists(partial):
+            os.remove(partial)
+    return {'rows': rows, 'seconds': round(time.perf_counter() - start, 3)}
+
+def database_is_current(db_path, csv_path):
+    """
+    True when the database exists and was imported from the CSV as it is now
+    Without the CSV (a database-only deployment) an existing file is current
+    """
+    if not os.path.exists(db_path):
+        return False
+    try:
+        stat = os.stat(csv_path)
+    except OSError:
+        return True
+    try:
+        with closing(sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)) as connection:
+            built_from = connection.execute(f"SELECT size, mtime_ns FROM {BUILD_INFO_TABLE}").fetchone()
+    except sqlite3.Error:
+        # Imported before build info was recorded, or not a database
+        return False
+    return built_from == (stat.st_size, stat.st_mtime_ns)
+
+# ─── QUERIES ──────────────────────────────────────────────────
+class SQLiteSalesSource(SalesSource):
+    """
+    Sales table in a local SQLite file
+    Filters and group-bys run in the database; only aggregates (and the
+    bounded detail rows of the transaction table) are read into pandas
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._local = threading.local()
+        start = time.perf_counter()
+        stat = os.stat(db_path)
+        self.dimensions = self._dimension_dictionary()
+        bounds = self.read(f"SELECT MIN(fecha) AS desde, MAX(fecha) AS hasta FROM {SALES_TABLE}").iloc[0]
+        self.date_bounds = None if pd.isna(bounds["desde"]) else (
+            pd.Timestamp(bounds["desde"]).date(), pd.Timestamp(bounds["hasta"]).date()
+        )
+        # pandas dtype per column, so results keep their types even when empty
+        self.dtypes = {
+            row["name"]: SQL_DTYPES.get(row["type"], "str")
+            for _, row in self.read(f"PRAGMA table_info({SALES_TABLE})").iterrows()
+        }
+        self.load_info = {
+            'snapshot': "sqlite",
+            'data_version': f"sqlite-{stat.st_size}-{stat.st_mtime_ns}",
+            'rows': int(self.read(f"SELECT COUNT(*) AS filas FROM {SALES_TABLE}")["filas"].iloc[0]),
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'seconds': round(time.perf_counter() - start, 3)
+        }
+
+    def connection(self):
+        """Read-only connection of the calling thread (sqlite3 objects are per thread)"""
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True)
+            self._local.connection = connection
+        return connection
+
+    def read(self, sql, params=()):
+        """Run a query and return its result as a DataFrame"""
+        return pd.read_sql_query(sql, self.connection(), params=list(params))
+
+    def _dimension_dictionary(self):
+        """
+        Sidebar dimension dictionary from one GROUP BY over the filter
+        dimensions; combinations in order of first appearance, so values are
+        listed in the same order as the pandas path
+        """
+        columns = ", ".join(_quote(dim) for dim in FILTER_DIMENSIONS)
+        combos = self.read(
+            f"SELECT {columns}, COUNT(*) AS filas, SUM(ventas_total) AS ventas_total "
+            f"FROM {SALES_TABLE} GROUP BY {columns} ORDER BY MIN(rowid)"
+        )
+        return build_dimension_dictionary(combos, combos["filas"], combos["ventas_total"])
+
+    def where(self, regions, categories, channels, salespeople, date_range=None):
+        return SalesQuery(self, sidebar_selections(regions, categories, channels, salespeople), date_range)
+
+class SalesQuery(SalesSelection):
+    """
+    A sidebar selection over the SQL sales table, resolved lazily
+    Every method is one query with the selection as its WHERE clause
+    """
+
+    def __init__(self, source, selections, date_range=None):
+        self.source = source
+        self.selections = selections
+        self.date_range = date_range
+
+    def _where(self):
+        """
+        WHERE clause and parameters; dimensions with every value selected are
+        skipped, and a date range is a range scan on the fecha index
+        """
+        clauses, params = [], []
+        for dim, values in self.selections.items():
+            values = list(dict.fromkeys(str(value) for value in values))
+            if set(values) >= set(self.source.dimensions['values'][dim]):
+                continue
+            if not values:
+                return " WHERE 0", []
+            clauses.append(f"{_quote(dim)} IN ({', '.join('?' * len(values))})")
+            params += values
+        if self.date_range is not None:
+            clauses.append("fecha BETWEEN ? AND ?")
+            params += [day.isoformat() for day in self.date_range]
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    def group_by(self, by, measures, max_measures):
+        """
+        Group the selected rows by `by` in SQL, as a cube slice
+        Summed measures, the helper counts and max measures under their cube
+        names, so aggregation_plan rolls it up like the sales cube; one row
+        of totals when `by` is empty
+        """
+        where, params = self._where()
+        selects = [_quote(col) for col in by]
+        selects += [f"COALESCE(SUM({_quote(col)}), 0) AS {_quote(col)}" for col in measures]
+        selects += [f"{COUNT_EXPRESSIONS[col]} AS {_quote(col)}" for col in COUNT_COLUMNS]
+        selects += [f"MAX({_quote(MAX_MEASURES[col])}) AS {_quote(col)}" for col in max_measures]
+
+        sql = f"SELECT {', '.join(selects)} FROM {SALES_TABLE}{where}"
+        if by:
+            sql += f" GROUP BY {', '.join(_quote(col) for col in by)}"
+        dtypes = self.source.dtypes
+        return self.source.read(sql, params).astype({
+            **{col: dtypes[col] for col in by + measures},
+            **{col: "int64" for col in COUNT_COLUMNS},
+            # MAX over no rows is NULL: only grouped rows are never empty
+            **({col: dtypes[MAX_MEASURES[col]] for col in max_measures} if by else {})
+        })
+
+    def execute_plan(self, plan):
+        """
+        Every request of an aggregation plan from one GROUP BY over the
+        plan's keys; the requests are rolled up from it in pandas
+        """
+        return execute_plan(plan, self.group_by(plan['keys'], plan['measures'], plan['max_measures']))
+
+    def top_k(self, key, by, k):
+        """
+        The k `key` values with the largest sum of `by`, plus "Other", as
+        top_k.top_k_ranking() returns them
+        The ranking, the value count and the grand totals come from one
+        query, so only k rows reach pandas
+        """
+        where, params = self._where()
+        sums = {by: f"COALESCE(SUM({_quote(by)}), 0)", **COUNT_EXPRESSIONS}
+        selects = [_quote(key)]
+        selects += [f"{sql} AS {_quote(col)}" for col, sql in sums.items()]
+        selects += [f"SUM({sql}) OVER () AS {_quote('total_' + col)}" for col, sql in sums.items()]
+        selects.append("COUNT(*) OVER () AS valores")
+        top = self.source.read(
+            f"SELECT {', '.join(selects)} FROM {SALES_TABLE}{where} GROUP BY {_quote(key)} "
+            f"ORDER BY {_quote(by)} DESC, {_quote(key)} LIMIT ?", params + [k]
+        )
+        values = int(top["valores"].iloc[0]) if len(top) else 0
+        other = {col: top[f"total_{col}"].iloc[0] - top[col].sum() for col in sums} if len(top) else {}
+        ranking = top[[key, *sums]].astype({
+            by: self.source.dtypes[by], **{col: "int64" for col in COUNT_COLUMNS}
+        })
+        return {'ranking': append_other(ranking, key, other, values - len(top)), 'values': values}
+
+    def count_distinct(self, column):
+        """Distinct non-null values of a column over the selected rows"""
+        where, params = self._where()
+        sql = f"SELECT COUNT(DISTINCT {_quote(column)}) AS distintos FROM {SALES_TABLE}{where}"
+        return int(self.source.read(sql, params)["distintos"].iloc[0])
+
+    def daily_sales(self):
+        """Sales per day of the selected rows (fecha, ventas_total), for the trend index"""
+        where, params = self._where()
+        daily = self.source.read(
+            f"SELECT fecha, SUM(ventas_total) AS ventas_total FROM {SALES_TABLE}{where} "
+            f"GROUP BY fecha ORDER BY fecha", params
+        )
+        daily["fecha"] = pd.to_datetime(daily["fecha"])
+        return daily
+
+    def detail_rows(self):
+        """Up to detail_row_limit selected transactions, in table order"""
+        where, params = self._where()
+        rows = self.source.read(
+            f"SELECT * FROM {SALES_TABLE}{where} ORDER BY rowid LIMIT ?",
+            params + [get_data_settings()['detail_row_limit']]
+        )
+        rows["fecha"] = pd.to_datetime(rows["fecha"])
+        return rows
+
+    def iter_rows(self, chunk_rows):
+        """Every selected transaction in table order, `chunk_rows` at a time"""
+        where, params = self._where()
+        chunks = pd.read_sql_query(
+            f"SELECT * FROM {SALES_TABLE}{where} ORDER BY rowid", self.source.connection(),
+            params=params, chunksize=chunk_rows
+        )
+        for chunk in chunks:
+            chunk["fecha"] = pd.to_datetime(chunk["fecha"])
+            yield chunk
+
+# ─── STREAMLIT CACHING ────────────────────────────────────────
+@st.cache_resource(max_entries=1)
+def _cached_source(db_path, size, mtime_ns):
+    """Open the database once per file version"""
+    return SQLiteSalesSource(db_path)
+
+def load_sqlite_source():
+    """
+    Return the SQL source for the configured database
+    The CSV is imported when the database is missing or was imported from
+    an older version of the CSV
+    """
+    settings = get_data_settings()
+    db_path, csv_path = settings['database_path'], settings['csv_path']
+    if not database_is_current(db_path, csv_path):
+        with _build_lock:
+            # Another rerun may have finished the import while this one waited
+            if not database_is_current(db_path, csv_path):
+                build_database(csv_path, db_path)
+    stat = os.stat(db_path)
+    return _cached_source(db_path, stat.st_size, stat.st_mtime_ns)
+
+def main():
+    parser = argparse.ArgumentParser(description="Import the sales CSV into an indexed SQLite database")
+    parser.add_argument("--csv", default=None, help="Source CSV (default: configured csv_path)")
+    parser.add_argument("--database", default=None, help="Target database (default: configured database_path)")
+    parser.add_argument("--chunk-rows", type=int, default=None)
+    args = parser.parse_args()
+
+    info = build_database(args.csv, args.database, args.chunk_rows)
+    print(f"Imported {info['rows']:,} rows in {info['seconds']}s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from config import get_data_settings
+from data_loader import derive_sales_columns, apply_filters
+from filter_index import FILTER_DIMENSIONS, build_filter_index, select_rows
+from sales_cube import build_sales_cube, merge_cubes, union_categories, cube_dimension_dictionary
+from distinct_sketch import build_customer_sketches, merge_sketches, count_distinct_selection
+from aggregation_plan import execute_plan
+from parallel_engine import parallel_workers, count_unique
+from sales_source import SalesSource, SalesSelection, sidebar_selections
+
+# Distinct (filter dimensions, customer) combinations: enough to answer the
+# unique-customer KPI for any sidebar selection without keeping the rows
+CUSTOMER_KEYS = FILTER_DIMENSIONS + ["cliente"]
+
+def iter_sales_chunks(csv_path=None, chunk_rows=None):
+    """Yield processed sales chunks of at most `chunk_rows` rows"""
+    settings = get_data_settings()
+    csv_path = csv_path or settings['csv_path']
+    chunk_rows = chunk_rows or settings['chunk_rows']
+    for chunk in pd.read_csv(csv_path, chunksize=chunk_rows):
+        yield derive_sales_columns(chunk)
+
+def _merge_distinct(frame, other, columns):
+    """Union two frames of distinct key combinations"""
+    frame, other = frame.copy(), other.copy()
+    for col in columns:
+        categories = union_categories(frame[col], other[col])
+        frame[col] = frame[col].cat.set_categories(categories)
+        other[col] = other[col].cat.set_categories(categories)
+    return pd.concat([frame, other], ignore_index=True).drop_duplicates(ignore_index=True)
+
+def _fold(partials, merge):
+    """Merge a list of partial aggregates pairwise into one"""
+    while len(partials) > 1:
+        partials = [
+            merge(partials[i], partials[i + 1]) if i + 1 < len(partials) else partials[i]
+            for i in range(0, len(partials), 2)
+        ]
+    return partials[0]
+
+def stream_sales_aggregates(csv_path=None, chunk_rows=None, data_version=None):
+    """
+    Build the sales cube and the customer table in one pass over the CSV
+    Peak memory is one chunk plus the partial aggregates, which are folded
+    whenever they outgrow the chunk size. In sketch mode, per-chunk
+    customer sketches are merged instead of keeping the exact table.
+    """
+    start = time.perf_counter()
+    settings = get_data_settings()
+    chunk_rows = chunk_rows or settings['chunk_rows']
+    use_sketches = settings['distinct_customers'] == "sketch"
+    merge_customers = merge_sketches if use_sketches else (
+        lambda a, b: _merge_distinct(a, b, CUSTOMER_KEYS)
+    )
+    
+    cubes, customer_parts, rows, chunks = [], [], 0, 0
+    for chunk in iter_sales_chunks(csv_path, chunk_rows):
+        cubes.append(build_sales_cube(chunk))
+        if use_sketches:
+            customer_parts.append(build_customer_sketches(chunk, settings['sketch_precision']))
+        else:
+            customers = chunk[CUSTOMER_KEYS].copy()
+            customers["cliente"] = customers["cliente"].astype("category")
+            customer_parts.append(customers.drop_duplicates(ignore_index=True))
+        rows += len(chunk)
+        chunks += 1
+        
+        if sum(len(cube) for cube in cubes) > 2 * chunk_rows:
+            cubes = [_fold(cubes, merge_cubes)]
+        if len(customer_parts) > 1 and (use_sketches or sum(len(part) for part in customer_parts) > 2 * chunk_rows):
+            customer_parts = [_fold(customer_parts, merge_customers)]
+    
+    if not cubes:
+        raise ValueError(f"No sales rows found in {csv_path or settings['csv_path']}")
+    cube = _fold(cubes, merge_cubes)
+    customers = _fold(customer_parts, merge_customers)
+    return {
+        'cube': {'frame': cube, 'index': build_filter_index(cube)},
+        'dimensions': cube_dimension_dictionary(cube),
+        'customers': None if use_sketches else {'frame': customers, 'index': build_filter_index(customers)},
+        'customer_sketches': customers if use_sketches else None,
+        'load_info': {
+            'snapshot': "streamed",
+            'data_version': data_version,
+            'rows': rows,
+            'chunks': chunks,
+            'seconds': round(time.perf_counter() - start, 3)
+        }
+    }
+
+def read_filtered_rows(selections, limit, csv_path=None, chunk_rows=None):
+    """
+    Return up to `limit` transactions matching the selection
+    Scans chunk by chunk and stops as soon as enough rows are found
+    """
+    found, remaining = [], limit
+    for chunk in iter_sales_chunks(csv_path, chunk_rows):
+        mask = np.logical_and.reduce([
+            chunk[dim].isin(values).to_numpy() for dim, values in selections.items()
+        ])
+        matched = chunk[mask].head(remaining)
+        if len(matched):
+            found.append(matched.astype({dim: str for dim in FILTER_DIMENSIONS}))
+            remaining -= len(matched)
+        if remaining <= 0:
+            break
+    if not found:
+        return derive_sales_columns(pd.read_csv(csv_path or get_data_settings()['csv_path'], nrows=0))
+    return pd.concat(found, ignore_index=True)
+
+# ─── STREAMLIT CACHING ────────────────────────────────────────
+@st.cache_resource(max_entries=1)
+def _cached_stream(csv_path, size, mtime_ns, chunk_rows):
+    """Stream the CSV once per file version"""
+    return stream_sales_aggregates(csv_path, chunk_rows, data_version=f"{size}-{mtime_ns}")
+
+def load_streamed_sales():
+    """Return the streamed cube and customer table for the configured CSV"""
+    settings = get_data_settings()
+    stat = os.stat(settings['csv_path'])
+    return _cached_stream(settings['csv_path'], stat.st_size, stat.st_mtime_ns, settings['chunk_rows'])
+
+@st.cache_data(max_entries=16)
+def _cached_detail_rows(csv_path, size, mtime_ns, detail_row_limit, regions, categories, channels, salespeople):
+    """Scan detail rows once per file version and selection"""
+    selections = sidebar_selections(list(regions), list(categories), list(channels), list(salespeople))
+    return read_filtered_rows(selections, detail_row_limit, csv_path)
+
+def load_detail_rows(regions, categories, channels, salespeople):
+    """Bounded detail rows for the transaction table in streaming mode"""
+    settings = get_data_settings()
+    stat = os.stat(settings['csv_path'])
+    return _cached_detail_rows(
+        settings['csv_path'], stat.st_size, stat.st_mtime_ns, settings['detail_row_limit'],
+        regions, categories, channels, salespeople
+    )
+
+# ─── DATA SOURCE ──────────────────────────────────────────────
+class StreamedSalesSource(SalesSource):
+    """
+    Streaming mode: the cube and the customer table (or sketches) from one
+    pass over the CSV. No rows stay in memory, so the date filter is not
+    offered and customers are not ranked
+    """
+    
+    def __init__(self, streamed):
+        self.streamed = streamed
+        self.dimensions = streamed['dimensions']
+        self.load_info = streamed['load_info']
+    
+    def where(self, regions, categories, channels, salespeople, date_range=None):
+        return StreamedSelection(self.streamed, (tuple(regions), tuple(categories), tuple(channels), tuple(salespeople)))
+
+class StreamedSelection(SalesSelection):
+    """A sidebar selection answered from the streamed cube and customer table"""
+    
+    def __init__(self, streamed, sidebar):
+        self.streamed = streamed
+        self.sidebar = sidebar
+        self.selections = sidebar_selections(*sidebar)
+    
+    def execute_plan(self, plan):
+        cube = self.streamed['cube']
+        mask = select_rows(cube['index'], self.selections)
+        sliced = cube['frame'] if mask is None else cube['frame'][mask]
+        return execute_plan(plan, sliced, parallel_workers(len(sliced)))
+    
+    def count_distinct(self, column):
+        # Only the sidebar dimensions and cliente are kept, in the customer table or sketches
+        if column == "cliente" and self.streamed['customer_sketches'] is not None:
+            return count_distinct_selection(self.streamed['customer_sketches'], self.selections)
+        customers = self.streamed['customers']
+        mask = select_rows(customers['index'], self.selections)
+        rows = customers['frame'] if mask is None else customers['frame'][mask]
+        return count_unique(rows[column], parallel_workers(len(rows)))
+    
+    def top_k(self, key, by, k):
+        return None
+    
+    def daily_sales(self):
+        return None
+    
+    def detail_rows(self):
+        # A bounded scan of the CSV, cached per selection
+        return load_detail_rows(*self.sidebar)
+    
+    def iter_rows(self, chunk_rows):
+        for chunk in iter_sales_chunks(chunk_rows=chunk_rows):
+            yield apply_filters(chunk, *self.sidebar)
+
+def load_streamed_source():
+    """The streamed source for the configured CSV"""
+    return StreamedSalesSource(load_streamed_sales())
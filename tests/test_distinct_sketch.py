@@ -0,0 +1,79 @@
+"""Distinct-customer sketches against nunique over the selected rows"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from distinct_sketch import (
+    build_customer_sketches, merge_sketches, count_distinct_selection, count_distinct_by
+)
+
+def random_sales(rng, n_rows, n_customers):
+    """Rows with the sketch keys and a Zipf-ish customer column"""
+    weights = 1 / np.arange(1, n_customers + 1)
+    return pd.DataFrame({
+        'region': rng.choice(["Norte", "Sur", "Este", "Oeste"], n_rows),
+        'categoria': rng.choice(["A", "B", "C"], n_rows),
+        'canal': rng.choice(["Online", "Tienda"], n_rows),
+        'vendedor': rng.choice([f"V{i}" for i in range(6)], n_rows),
+        'mes': rng.choice([f"2024-{m:02d}" for m in range(1, 13)], n_rows),
+        'cliente': rng.choice(n_customers, n_rows, p=weights / weights.sum()).astype(str)
+    })
+
+def random_selection(rng, frame):
+    """A random non-empty subset of each filter dimension"""
+    selection = {}
+    for dim in ["region", "categoria", "canal", "vendedor"]:
+        values = sorted(frame[dim].unique())
+        selection[dim] = list(rng.choice(values, rng.integers(1, len(values) + 1), replace=False))
+    return selection
+
+def brute_force(frame, selection):
+    """Distinct customers of the selected rows"""
+    mask = np.logical_and.reduce([frame[dim].isin(values).to_numpy() for dim, values in selection.items()])
+    return frame.loc[mask, "cliente"].nunique()
+
+@pytest.mark.parametrize("seed", range(10))
+def test_sparse_cells_count_exactly(seed):
+    rng = np.random.default_rng(seed)
+    frame = random_sales(rng, 3000, 400)
+    # 512 exact hashes per cell: no cell here holds that many customers
+    sketch = build_customer_sketches(frame, precision=12)
+    for _ in range(10):
+        selection = random_selection(rng, frame)
+        assert count_distinct_selection(sketch, selection) == brute_force(frame, selection)
+
+@pytest.mark.parametrize("seed", range(5))
+def test_dense_cells_stay_within_error_bound(seed):
+    rng = np.random.default_rng(seed)
+    frame = random_sales(rng, 60_000, 40_000)
+    precision = 12
+    sketch = build_customer_sketches(frame, precision=precision, sparse_limit=16)
+    # Standard error is 1.04 / sqrt(2 ** precision) (1.6%); allow four of them
+    bound = 4 * 1.04 / np.sqrt(1 << precision)
+    for _ in range(5):
+        selection = random_selection(rng, frame)
+        exact = brute_force(frame, selection)
+        assert abs(count_distinct_selection(sketch, selection) - exact) <= bound * exact
+
+@pytest.mark.parametrize("sparse_limit", [16, None])
+def test_merged_partitions_equal_one_sketch(sparse_limit):
+    rng = np.random.default_rng(7)
+    frame = random_sales(rng, 20_000, 5000)
+    whole = build_customer_sketches(frame, sparse_limit=sparse_limit)
+    merged = merge_sketches(
+        build_customer_sketches(frame.iloc[:8000], sparse_limit=sparse_limit),
+        build_customer_sketches(frame.iloc[8000:], sparse_limit=sparse_limit)
+    )
+    for _ in range(10):
+        selection = random_selection(rng, frame)
+        assert count_distinct_selection(merged, selection) == count_distinct_selection(whole, selection)
+
+def test_count_by_month_matches_groupby():
+    rng = np.random.default_rng(3)
+    frame = random_sales(rng, 3000, 300)
+    by_month = count_distinct_by(build_customer_sketches(frame), "mes").set_index("mes")["clientes"]
+    expected = frame.groupby("mes")["cliente"].nunique()
+    pd.testing.assert_series_equal(
+        by_month.sort_index().astype(np.int64), expected.sort_index().astype(np.int64),
+        check_names=False, check_index_type=False
+    )
@@ -0,0 +1,73 @@
+"""select_rows and extend_filter_index against plain pandas filtering"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from filter_index import FILTER_DIMENSIONS, build_filter_index, extend_filter_index, select_rows
+
+def random_rows(rng, n_rows, with_missing=False):
+    """Categorical dimension columns with a few values each (and optional NaN)"""
+    frame = pd.DataFrame({
+        dim: pd.Categorical(rng.choice([f"{dim}_{i}" for i in range(k)], n_rows))
+        for dim, k in zip(FILTER_DIMENSIONS, (4, 6, 2, 12))
+    })
+    if with_missing:
+        frame.loc[rng.random(n_rows) < 0.05, "region"] = np.nan
+    return frame
+
+def random_selection(rng, frame):
+    """A random (possibly empty or full) subset of each dimension's values"""
+    selection = {}
+    for dim in FILTER_DIMENSIONS:
+        values = list(frame[dim].cat.categories)
+        share = rng.choice([0.0, 0.5, 1.0])
+        selection[dim] = [value for value in values if rng.random() < share]
+    return selection
+
+def brute_force_mask(frame, selection):
+    """The rows whose every dimension is in its selection, by isin"""
+    mask = np.ones(len(frame), dtype=bool)
+    for dim, values in selection.items():
+        mask &= frame[dim].isin(values).to_numpy()
+    return mask
+
+@pytest.mark.parametrize("seed", range(20))
+def test_select_rows_matches_isin(seed):
+    rng = np.random.default_rng(seed)
+    frame = random_rows(rng, int(rng.integers(1, 3000)), with_missing=seed % 2 == 1)
+    index = build_filter_index(frame)
+    for _ in range(10):
+        selection = random_selection(rng, frame)
+        expected = brute_force_mask(frame, selection)
+        mask = select_rows(index, selection)
+        if mask is None:
+            assert expected.all()
+        else:
+            np.testing.assert_array_equal(mask, expected)
+
+def test_select_rows_ignores_unknown_values():
+    rng = np.random.default_rng(0)
+    frame = random_rows(rng, 500)
+    index = build_filter_index(frame)
+    selection = {'region': ["region_1", "nowhere"]}
+    np.testing.assert_array_equal(select_rows(index, selection), brute_force_mask(frame, selection))
+
+@pytest.mark.parametrize("seed", range(10))
+def test_extended_index_matches_rebuilt_index(seed):
+    rng = np.random.default_rng(seed)
+    old, new = random_rows(rng, 800), random_rows(rng, 300)
+    # Appended rows carry the old categories plus any new ones, in that order
+    for dim in FILTER_DIMENSIONS:
+        categories = old[dim].cat.categories.union(new[dim].cat.categories, sort=False)
+        old[dim] = old[dim].cat.set_categories(categories)
+        new[dim] = new[dim].cat.set_categories(categories)
+    extended = extend_filter_index(build_filter_index(old), new)
+    combined = pd.concat([old, new], ignore_index=True)
+    for _ in range(10):
+        selection = random_selection(rng, combined)
+        expected = brute_force_mask(combined, selection)
+        mask = select_rows(extended, selection)
+        if mask is None:
+            assert expected.all()
+        else:
+            np.testing.assert_array_equal(mask, expected)
@@ -0,0 +1,52 @@
+"""Incremental ingest against a full reload of the edited CSV"""
+import pytest
+
+from generate_data import generate_sales_csv
+from incremental_loader import full_ingest, refresh_ingest
+
+@pytest.fixture
+def sales_csv(tmp_path, monkeypatch):
+    # Snapshots are written relative to the working directory
+    monkeypatch.chdir(tmp_path)
+    path = str(tmp_path / "ventas.csv")
+    generate_sales_csv(path, 20_000, 10, 30, 300, 6, seed=3)
+    return path
+
+def edit_middle_row(path):
+    """Rewrite one ventas_total between the guard windows, keeping the size"""
+    with open(path, "rb") as handle:
+        raw = handle.read()
+    start = raw.index(b"\n", len(raw) // 2) + 1
+    end = raw.index(b"\n", start)
+    fields = raw[start:end].decode().split(",")
+    value = int(fields[7])
+    fields[7] = str(value + 1000 if value < 8000 else value - 1000)
+    line = ",".join(fields).encode()
+    assert len(line) == end - start
+    with open(path, "wb") as handle:
+        handle.write(raw[:start] + line + raw[end:])
+    return raw[start:end + 1]
+
+def test_same_size_edit_rebuilds(sales_csv):
+    state = full_ingest(sales_csv)
+    edit_middle_row(sales_csv)
+    refreshed = refresh_ingest(state)
+    load_info = refreshed['frame'].attrs["load_info"]
+    assert load_info['ingest'] == "full"
+    assert load_info['data_version'] != state['frame'].attrs["load_info"]['data_version']
+    assert refreshed['frame']["ventas_total"].sum() == full_ingest(sales_csv)['frame']["ventas_total"].sum()
+    assert refresh_ingest(refreshed) is refreshed
+
+def test_every_publish_changes_data_version(sales_csv):
+    states = [full_ingest(sales_csv)]
+    row = edit_middle_row(sales_csv)
+    states.append(refresh_ingest(states[-1]))
+    with open(sales_csv, "ab") as handle:
+        handle.write(row)
+    states.append(refresh_ingest(states[-1]))
+    # A rebuild of unchanged bytes still replaces the state
+    states.append(full_ingest(sales_csv, states[-1]['version']))
+    modes = [state['frame'].attrs["load_info"]['ingest'] for state in states]
+    assert modes == ["full", "full", "append", "full"]
+    versions = {state['frame'].attrs["load_info"]['data_version'] for state in states}
+    assert len(versions) == len(states)
@@ -0,0 +1,40 @@
+"""Month-partitioned aggregation against the single-threaded path"""
+import pandas as pd
+import pytest
+
+from aggregation_plan import build_plan, execute_plan
+from charts import CHART_AGGREGATIONS
+from data_loader import KPI_AGGREGATIONS, read_sales_data
+from generate_data import generate_sales_csv
+from goal_attainment import GOAL_AGGREGATIONS
+from sales_cube import build_sales_cube
+
+PAGE_PLAN = build_plan({**KPI_AGGREGATIONS, **GOAL_AGGREGATIONS, **CHART_AGGREGATIONS})
+
+@pytest.fixture(scope="module")
+def sales_csv(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("data") / "ventas.csv")
+    generate_sales_csv(path, 30_000, 12, 40, 400, 12, seed=5)
+    return path
+
+@pytest.fixture(params=[False, True], ids=["standard", "compact"])
+def shuffled_rows(request, sales_csv):
+    df = read_sales_data(sales_csv, use_snapshot=False, compact=request.param)
+    # Interleave months so partitions are not contiguous row ranges
+    return df.sample(frac=1, random_state=7).reset_index(drop=True)
+
+@pytest.mark.parametrize("workers", [2, 3, 8])
+def test_parallel_cube_matches_serial(shuffled_rows, workers):
+    pd.testing.assert_frame_equal(build_sales_cube(shuffled_rows, workers), build_sales_cube(shuffled_rows, 1))
+
+@pytest.mark.parametrize("workers", [2, 3, 8])
+def test_parallel_plan_matches_serial(shuffled_rows, workers):
+    expected = execute_plan(PAGE_PLAN, shuffled_rows, 1)
+    results = execute_plan(PAGE_PLAN, shuffled_rows, workers)
+    assert results.keys() == expected.keys()
+    for name, result in results.items():
+        # Requests without group keys (and the totals) are plain dicts
+        if isinstance(result, dict):
+            assert result == expected[name]
+        else:
+            pd.testing.assert_frame_equal(result, expected[name])
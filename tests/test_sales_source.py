@@ -0,0 +1,75 @@
+"""SQLite source results against the in-memory pandas source"""
+import random
+
+import pandas as pd
+import pytest
+
+from aggregation_plan import build_plan
+from charts import CHART_AGGREGATIONS
+from data_loader import FrameSalesSource, KPI_AGGREGATIONS
+from generate_data import generate_sales_csv
+from goal_attainment import GOAL_AGGREGATIONS
+from incremental_loader import full_ingest
+from sql_backend import SQLiteSalesSource, build_database
+
+PAGE_PLAN = build_plan({**KPI_AGGREGATIONS, **GOAL_AGGREGATIONS, **CHART_AGGREGATIONS})
+
+@pytest.fixture(scope="module")
+def sources(tmp_path_factory):
+    # Snapshots are written relative to the working directory
+    with pytest.MonkeyPatch.context() as patch:
+        directory = tmp_path_factory.mktemp("data")
+        patch.chdir(directory)
+        csv_path = str(directory / "ventas.csv")
+        generate_sales_csv(csv_path, 20_000, 10, 30, 300, 6, seed=11)
+        db_path = str(directory / "ventas.sqlite")
+        build_database(csv_path, db_path)
+        yield FrameSalesSource(full_ingest(csv_path)), SQLiteSalesSource(db_path)
+
+def random_selections(source, seed):
+    """Sidebar selections: all values (the default), one value, or a random subset"""
+    rng = random.Random(seed)
+    selections = []
+    for dim in ["region", "categoria", "canal", "vendedor"]:
+        values = list(source.dimensions['values'][dim])
+        selections.append(rng.choice([values, values[:1], rng.sample(values, rng.randint(1, len(values)))]))
+    first, last = source.date_bounds
+    start = first + (last - first) * rng.random() / 2
+    date_range = rng.choice([None, (start, start + (last - start) * rng.random())])
+    return selections, date_range
+
+def as_strings(frame):
+    """Group keys compared by value: SQL returns strings, the frame categories"""
+    frame = frame.copy()
+    for column in frame.columns:
+        if not pd.api.types.is_numeric_dtype(frame[column]):
+            frame[column] = frame[column].astype(str)
+    return frame.reset_index(drop=True)
+
+def assert_results_equal(result, expected):
+    if isinstance(expected, dict):
+        assert result.keys() == expected.keys()
+        for name, value in expected.items():
+            assert result[name] == pytest.approx(value)
+    else:
+        pd.testing.assert_frame_equal(as_strings(result), as_strings(expected), check_dtype=False)
+
+@pytest.mark.parametrize("seed", range(8))
+def test_sqlite_matches_pandas(sources, seed):
+    frame_source, sql_source = sources
+    selections, date_range = random_selections(frame_source, seed)
+    expected = frame_source.where(*selections, date_range)
+    selection = sql_source.where(*selections, date_range)
+
+    results, expected_results = selection.execute_plan(PAGE_PLAN), expected.execute_plan(PAGE_PLAN)
+    assert results.keys() == expected_results.keys()
+    for name, result in results.items():
+        assert_results_equal(result, expected_results[name])
+
+    assert selection.count_distinct("cliente") == expected.count_distinct("cliente")
+    ranking, expected_ranking = selection.top_k("cliente", "ventas_total", 10), expected.top_k("cliente", "ventas_total", 10)
+    assert ranking['values'] == expected_ranking['values']
+    assert_results_equal(ranking['ranking'], expected_ranking['ranking'])
+    assert_results_equal(selection.daily_sales(), expected.daily_sales())
+    assert len(selection.detail_rows()) == min(len(expected.detail_rows()), 1_000)
+    assert sum(map(len, selection.iter_rows(3_000))) == sum(map(len, expected.iter_rows(3_000)))
@@ -0,0 +1,94 @@
+"""Date slices and monthly prefix sums against direct filtering"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from sales_trend import (
+    build_time_index, date_slice, slice_time_index, sales_trend,
+    month_number, build_month_prefix, period_totals, compare_periods
+)
+
+def random_sales(rng, n_rows, n_days=800):
+    """Unsorted dated rows over ~26 months, with a few missing dates"""
+    days = pd.Timestamp("2023-01-01") + pd.to_timedelta(rng.integers(0, n_days, n_rows), unit="D")
+    frame = pd.DataFrame({'fecha': days, 'ventas_total': rng.integers(10, 5000, n_rows).astype(float)})
+    frame.loc[rng.random(n_rows) < 0.02, "fecha"] = pd.NaT
+    return frame
+
+def random_range(rng):
+    """Inclusive (start, end) dates, sometimes reaching past the data"""
+    start = pd.Timestamp("2022-12-01") + pd.Timedelta(days=int(rng.integers(0, 860)))
+    return start.date(), (start + pd.Timedelta(days=int(rng.integers(0, 300)))).date()
+
+@pytest.mark.parametrize("seed", range(10))
+def test_date_slice_matches_date_filter(seed):
+    rng = np.random.default_rng(seed)
+    frame = random_sales(rng, 3000)
+    index = build_time_index(frame)
+    for _ in range(20):
+        start, end = random_range(rng)
+        lo, hi = date_slice(index, start, end)
+        in_range = frame["fecha"].between(pd.Timestamp(start), pd.Timestamp(end)).to_numpy()
+        np.testing.assert_array_equal(np.sort(index['order'][lo:hi]), np.flatnonzero(in_range))
+
+@pytest.mark.parametrize("seed", range(5))
+def test_sliced_trend_matches_groupby(seed):
+    rng = np.random.default_rng(seed)
+    frame = random_sales(rng, 3000)
+    index = build_time_index(frame)
+    mask = rng.random(len(frame)) < 0.5
+    start, end = random_range(rng)
+    trend, _, _ = sales_trend(slice_time_index(index, *date_slice(index, start, end)), mask, granularity="month")
+    rows = frame[mask & frame["fecha"].between(pd.Timestamp(start), pd.Timestamp(end)).to_numpy()]
+    expected = rows.groupby(rows["fecha"].dt.to_period("M"))["ventas_total"].sum()
+    assert np.isclose(trend["ventas_total"].sum(), rows["ventas_total"].sum())
+    nonzero = trend[trend["ventas_total"] != 0]
+    np.testing.assert_allclose(nonzero["ventas_total"].to_numpy(), expected[expected != 0].to_numpy())
+
+def monthly_totals(rng):
+    """A monthly aggregate with gaps: months without rows are missing"""
+    months = pd.period_range("2022-01", "2024-12", freq="M")
+    months = months[rng.random(len(months)) < 0.7]
+    return pd.DataFrame({
+        'mes': months.astype(str),
+        'ventas_total': rng.integers(0, 10_000, len(months)).astype(float),
+        'unidades': rng.integers(0, 500, len(months))
+    })
+
+@pytest.mark.parametrize("seed", range(10))
+def test_period_totals_match_direct_sums(seed):
+    rng = np.random.default_rng(seed)
+    monthly = monthly_totals(rng)
+    month_prefix = build_month_prefix(monthly)
+    numbers = np.array([month_number(pd.Period(mes, freq="M")) for mes in monthly["mes"]])
+    for _ in range(30):
+        start = int(rng.integers(numbers.min() - 3, numbers.max() + 3))
+        end = start + int(rng.integers(0, 14))
+        totals = period_totals(month_prefix, start, end)
+        if start < numbers.min() or end > numbers.max():
+            assert totals is None
+            continue
+        within = (numbers >= start) & (numbers <= end)
+        for col in ["ventas_total", "unidades"]:
+            assert totals[col] == pytest.approx(monthly.loc[within, col].sum())
+
+def test_compare_periods_shifts_whole_spans():
+    rng = np.random.default_rng(1)
+    monthly = monthly_totals(rng)
+    month_prefix = build_month_prefix(monthly)
+    by_month = dict(zip(
+        [month_number(pd.Period(mes, freq="M")) for mes in monthly["mes"]], monthly["ventas_total"]
+    ))
+    last = max(by_month)
+    for shift, months in [(1, 1), (12, 1), (12, 3)]:
+        current, previous = compare_periods(month_prefix, last, shift, months)
+        assert current["ventas_total"] == pytest.approx(sum(by_month.get(last - k, 0) for k in range(months)))
+        assert previous["ventas_total"] == pytest.approx(
+            sum(by_month.get(last - shift - k, 0) for k in range(months))
+        )
+    # Nothing indexed two years before the first month
+    assert compare_periods(month_prefix, min(by_month), 24)[1] is None
+
+def test_empty_monthly_aggregate_has_no_periods():
+    month_prefix = build_month_prefix(pd.DataFrame({'mes': pd.Series([], dtype=str), 'ventas_total': []}))
+    assert period_totals(month_prefix, 0, 0) is None
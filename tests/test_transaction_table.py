@@ -0,0 +1,23 @@
+"""Server-side table paging against a full pandas sort"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from charts import page_positions
+from sales_cube import union_categories
+
+@pytest.mark.parametrize("seed", range(10))
+@pytest.mark.parametrize("ascending", [True, False])
+def test_appended_categories_sort_by_value(seed, ascending):
+    rng = np.random.default_rng(seed)
+    existing = pd.Series(pd.Categorical(rng.choice(["m", "q", "x"], 200)))
+    # Values first seen in appended rows get the highest codes
+    appended = pd.Series(rng.choice(["a", "n", "z", None], 100), dtype=object)
+    categories = union_categories(existing, appended)
+    column = pd.concat([existing.astype(object), appended], ignore_index=True).astype(
+        pd.CategoricalDtype(categories)
+    )
+    expected = column.astype(object).sort_values(ascending=ascending, kind="stable", na_position="last")
+    for start, stop in [(0, 20), (40, 90), (0, len(column))]:
+        positions = page_positions(column, ascending, start, stop)
+        np.testing.assert_array_equal(positions, expected.index[start:stop])
@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+
+# Label of the row that sums everything outside the top K
+OTHER_LABEL = "Other"
+
+def top_k_positions(values, k):
+    """
+    Positions of the k largest values, largest first
+    np.argpartition finds them in O(n); only the k winners are sorted.
+    NaN values rank last
+    """
+    values = np.nan_to_num(np.asarray(values, dtype=np.float64), nan=-np.inf)
+    if k <= 0:
+        return np.array([], dtype=np.int64)
+    if k < len(values):
+        chosen = np.argpartition(-values, k - 1)[:k]
+    else:
+        chosen = np.arange(len(values))
+    return chosen[np.argsort(-values[chosen], kind="stable")]
+
+def append_other(top, key, other_totals, other_count, other_label=OTHER_LABEL):
+    """
+    Top rows plus one "Other" row holding other_totals ({column: sum})
+    over other_count more values; no Other row when other_count is 0
+    """
+    top = top.reset_index(drop=True)
+    top[key] = top[key].astype(str)
+    if not other_count:
+        return top
+    other = {**other_totals, key: f"{other_label} ({other_count:,})"}
+    return pd.concat([top, pd.DataFrame([other], columns=top.columns)], ignore_index=True)
+
+def top_k_with_other(table, key, by, k, other_label=OTHER_LABEL):
+    """
+    The k rows of an aggregate with the largest `by`, plus one "Other" row
+    table: one row per `key` value (e.g. a product_sales aggregate). The
+    other numeric columns are summed over the remaining rows, so totals
+    are kept; the Other row is labelled with how many values it holds.
+    Returns a new frame with `key` as strings, largest first, Other last
+    """
+    chosen = top_k_positions(table[by], k)
+    rest = np.ones(len(table), dtype=bool)
+    rest[chosen] = False
+    remainder = table[rest]
+    numeric = [col for col in table.columns if col != key and pd.api.types.is_numeric_dtype(table[col].dtype)]
+    return append_other(
+        table.iloc[chosen], key, {col: remainder[col].sum() for col in numeric}, len(remainder), other_label
+    )
+
+def top_k_ranking(table, key, by, k):
+    """
+    A ranking as the charts draw it: {'ranking': top_k_with_other frame,
+    'values': number of `key` values ranked}
+    """
+    return {'ranking': top_k_with_other(table, key, by, k), 'values': len(table)}